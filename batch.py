@@ -0,0 +1,148 @@
+import argparse
+import glob
+import json
+import os
+import signal
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List
+
+from distances import precompute
+from graph import GridGraph
+from loader import layout, layout_key, parse_grid, read_lines
+from mapf import ANYTIME_SOLVERS, SOLVERS, multi_agent_pathfinding
+from stats import SearchStats
+
+# Graphs already built in this worker, keyed by map layout, so instances on the same map
+# share the graph and its heuristic caches. Only the MAX_GRAPHS most recently used are kept.
+MAX_GRAPHS = 4
+_graphs: OrderedDict[str, GridGraph] = OrderedDict()
+
+class InstanceTimeout(Exception):
+    pass
+
+def _raise_timeout(signum, frame):
+    raise InstanceTimeout()
+
+def collect_files(patterns: List[str]) -> List[str]:
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            files.extend(sorted(glob.glob(os.path.join(pattern, "*.txt"))))
+        else:
+            files.extend(sorted(glob.glob(pattern)))
+    return files
+
+def solve_file(filename: str, timeout: float | None = None, distance_cache: str | None = None,
+    ordering_workers = 1, **options) -> Dict:
+    t0 = time.perf_counter()
+    grid = read_lines(filename)
+    key = layout_key(grid)
+    if key in _graphs:
+        _graphs.move_to_end(key)
+    else:
+        graph = GridGraph.from_grid(layout(grid))
+        graph.freeze()
+        _graphs[key] = graph
+        while len(_graphs) > MAX_GRAPHS:
+            _graphs.popitem(last=False)
+    graph, agents = parse_grid(grid, _graphs[key])
+    agents = [agents[a] for a in sorted(agents.keys())]
+    start = [a.init_pos for a in agents]
+    goal = [a.goal for a in agents]
+    if distance_cache is not None:
+        # exact heuristics for this instance's goals, shared with other workers through the cache
+        precompute(graph, [g for g in goal if 0 <= g < graph.size], distance_cache)
+
+    result = {"file": filename, "map": key, "agents": len(agents), "status": "ok"}
+    if options.get("solver") == "orderings":
+        # instances already run in parallel, one per worker, so the ordering search of each
+        # only gets a few processes of its own (one by default)
+        options["workers"] = ordering_workers
+    if timeout is not None and options.get("solver", "prioritized") in ANYTIME_SOLVERS:
+        # a little earlier than the alarm, so anytime solvers can still return their best plans
+        options.setdefault("time_limit", timeout * 0.9)
+    # counts the searches cut short by a node or time limit, reported below
+    stats = options.setdefault("stats", SearchStats())
+    # SIGALRM interrupts the solver where it is; platforms without it rely on time_limit
+    use_alarm = timeout is not None and hasattr(signal, "SIGALRM")
+    if use_alarm:
+        previous = signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        plans = multi_agent_pathfinding(graph, start, goal, **options)
+    except InstanceTimeout:
+        plans = None
+        result["status"] = "timeout"
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+
+    solved = [p for p in plans or [] if p]
+    result["solved"] = len(solved)
+    result["success_rate"] = len(solved) / len(agents) if agents else 1.0
+    result["sum_of_costs"] = sum(len(p) - 1 for p in solved)
+    result["makespan"] = max((len(p) - 1 for p in solved), default=0)
+    result["wall_time"] = time.perf_counter() - t0
+    result["limit"] = stats.limits > 0
+    return result
+
+def _layout_of(filename: str) -> str:
+    try:
+        return layout_key(read_lines(filename))
+    except OSError:
+        # reported by the worker that tries to solve it
+        return ""
+
+def run_batch(files: List[str], output, workers: int | None = None, timeout: float | None = None,
+    distance_cache: str | None = None, ordering_workers = 1, **options) -> List[Dict]:
+    results = []
+    # instances on the same map are handed out one after the other, so the workers that
+    # take them still have its graph
+    files = sorted(files, key=_layout_of)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(solve_file, f, timeout, distance_cache, ordering_workers, **options): f for f in files}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"file": futures[future], "status": "error", "error": repr(e)}
+            results.append(result)
+            # stream every result as soon as it's in
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve many grid files in parallel and report metrics as JSON lines")
+    parser.add_argument("paths", nargs="+",
+        help="grid files, glob patterns or directories (every .txt file inside is used)")
+    parser.add_argument("-j", "--workers", type=int, default=None, dest="workers",
+        help="number of worker processes (defaults to the number of CPUs)")
+    parser.add_argument("-o", "--output", default=None, dest="output",
+        help="write the JSON lines to this file instead of stdout")
+    parser.add_argument("-t", "--timeout", type=float, default=None, dest="timeout",
+        help="per-instance time limit in seconds")
+    parser.add_argument("-d", "--distance-cache", default=None, dest="distance_cache",
+        help="precompute goal distance tables into this directory and memory-map them in every worker")
+    parser.add_argument("--solver", choices=SOLVERS, default="prioritized", dest="solver")
+    parser.add_argument("-T", "--space-time", action="store_true", dest="space_time")
+    parser.add_argument("-w", "--window", type=int, default=None, dest="window")
+    parser.add_argument("--ordering-workers", type=int, default=1, dest="ordering_workers",
+        help="processes the ordering search of each instance may start (orderings solver only)")
+    args = parser.parse_args()
+
+    files = collect_files(args.paths)
+    output = open(args.output, "w") if args.output else sys.stdout
+    t0 = time.perf_counter()
+    try:
+        results = run_batch(files, output, args.workers, args.timeout, args.distance_cache, args.ordering_workers,
+            solver=args.solver, space_time=args.space_time, window=args.window)
+    finally:
+        if args.output:
+            output.close()
+    finished = [r for r in results if r["status"] == "ok"]
+    print(f"{len(finished)}/{len(results)} instances finished in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
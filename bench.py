@@ -0,0 +1,182 @@
+import argparse
+import gc
+import json
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+from batch import collect_files
+from graph import Graph, GridGraph
+from jps import jump_point_search
+from loader import read_grid
+from mapf import SOLVERS, a_star_coop, multi_agent_pathfinding
+from reservations import ReservationTable
+from stats import SearchStats
+
+def random_grid(width: int, height: int, wall_density: float, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    rows = ["#" * (width + 2)]
+    for _ in range(height):
+        rows.append("#" + "".join("#" if rng.random() < wall_density else " " for _ in range(width)) + "#")
+    rows.append("#" * (width + 2))
+    return rows
+
+def random_instance(width: int, height: int, wall_density: float, agents: int, seed: int) -> Tuple[GridGraph, List[int], List[int]]:
+    graph = GridGraph.from_grid(random_grid(width, height, wall_density, seed))
+    graph.freeze()
+    free = [n for n in range(graph.size) if graph.neighbours(n) != []]
+    rng = random.Random(seed)
+    cells = rng.sample(free, min(2 * agents, len(free)))
+    return graph, cells[0::2], cells[1::2]
+
+def sample_instance(filename: str) -> Tuple[GridGraph, List[int], List[int]]:
+    graph, agents = read_grid(filename)
+    agents = [agents[a] for a in sorted(agents.keys())]
+    return graph, [a.init_pos for a in agents], [a.goal for a in agents]
+
+def bench_astar(graph: Graph, start: List[int], goal: List[int], stats: SearchStats | None, **options) -> float:
+    solved = sum(1 for s,g in zip(start, goal) if a_star_coop(graph, s, g, ReservationTable(), stats=stats) is not None)
+    return solved / len(start) if start else 1.0
+
+def bench_jps(graph: GridGraph, start: List[int], goal: List[int], stats: SearchStats | None, **options) -> float:
+    solved = sum(1 for s,g in zip(start, goal) if jump_point_search(graph, s, g, stats) is not None)
+    return solved / len(start) if start else 1.0
+
+def bench_mapf(graph: Graph, start: List[int], goal: List[int], stats: SearchStats | None, **options) -> float:
+    plans = multi_agent_pathfinding(graph, start, goal, stats=stats, **options)
+    return sum(1 for p in plans if p) / len(plans) if plans else 1.0
+
+def bench_distances(graph: Graph, start: List[int], goal: List[int], stats: SearchStats | None, **options) -> float:
+    graph.calculate_distances()
+    return 1.0
+
+BENCHMARKS: Dict[str, Callable[..., float]] = {
+    "a_star": bench_astar,
+    "jps": bench_jps,
+    "mapf": bench_mapf,
+    "distances": bench_distances,
+}
+
+def measure(benchmark: str, graph: GridGraph, start: List[int], goal: List[int],
+    repeats = 5, warmup = 1, **options) -> Dict:
+    run = BENCHMARKS[benchmark]
+    times = []
+    success_rate = 1.0
+    for i in range(warmup + repeats):
+        # every run starts from cold distance and heuristic caches
+        graph.clear_distances()
+        gc.collect()
+        t0 = time.perf_counter()
+        success_rate = run(graph, start, goal, None, **options)
+        elapsed = time.perf_counter() - t0
+        if i >= warmup:
+            times.append(elapsed)
+
+    # counting has a (small) cost of its own, so it isn't part of the timed runs
+    graph.clear_distances()
+    stats = SearchStats()
+    run(graph, start, goal, stats, **options)
+    # the all-pairs Dijkstra isn't instrumented
+    expansions = stats.expansions if benchmark != "distances" else None
+
+    # tracemalloc slows everything down, so memory gets a run of its own
+    graph.clear_distances()
+    tracemalloc.start()
+    run(graph, start, goal, None, **options)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "benchmark": benchmark,
+        "cells": graph.size,
+        "agents": len(start),
+        "wall_time": {"min": min(times), "median": statistics.median(times), "mean": statistics.mean(times)},
+        "expansions": expansions,
+        "peak_memory": peak_memory,
+        "success_rate": success_rate,
+    }
+
+def compare(results: List[Dict], baseline: List[Dict], tolerance: float) -> List[str]:
+    # Lists every result that got slower, expanded more nodes or solved less than its baseline
+    previous = {(r["case"], r["benchmark"]): r for r in baseline}
+    regressions = []
+    for r in results:
+        base = previous.get((r["case"], r["benchmark"]))
+        if base is None:
+            continue
+        name = f"{r['case']} [{r['benchmark']}]"
+        if r["wall_time"]["median"] > base["wall_time"]["median"] * (1 + tolerance):
+            regressions.append(f"{name}: median time {base['wall_time']['median'] * 1000:.1f}ms -> {r['wall_time']['median'] * 1000:.1f}ms")
+        if r["expansions"] is not None and base["expansions"] is not None and r["expansions"] > base["expansions"] * (1 + tolerance):
+            regressions.append(f"{name}: expansions {base['expansions']} -> {r['expansions']}")
+        if r["success_rate"] < base["success_rate"]:
+            regressions.append(f"{name}: success rate {base['success_rate']:.1%} -> {r['success_rate']:.1%}")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the planners on random grids and sample files")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[16, 32, 64], dest="sizes",
+        help="side lengths of the random square grids")
+    parser.add_argument("--densities", type=float, nargs="+", default=[0.2], dest="densities",
+        help="wall densities of the random grids")
+    parser.add_argument("--agents", type=int, nargs="+", default=[4, 16], dest="agents",
+        help="agent counts of the random instances")
+    parser.add_argument("--seed", type=int, default=0, dest="seed")
+    parser.add_argument("--samples", nargs="*", default=["samples"], dest="samples",
+        help="grid files, globs or directories to benchmark as well (pass none to skip them)")
+    parser.add_argument("-b", "--benchmarks", nargs="+", choices=list(BENCHMARKS), default=list(BENCHMARKS), dest="benchmarks")
+    parser.add_argument("--distances-max-cells", type=int, default=1024, dest="distances_max_cells",
+        help="skip the all-pairs distance benchmark on graphs with more cells than this")
+    parser.add_argument("-n", "--repeats", type=int, default=5, dest="repeats")
+    parser.add_argument("--warmup", type=int, default=1, dest="warmup")
+    parser.add_argument("--solver", choices=SOLVERS, default="prioritized", dest="solver")
+    parser.add_argument("-T", "--space-time", action="store_true", dest="space_time")
+    parser.add_argument("-w", "--window", type=int, default=None, dest="window")
+    parser.add_argument("-o", "--output", default=None, dest="output",
+        help="write the results as JSON to this file instead of stdout")
+    parser.add_argument("--baseline", default=None, dest="baseline",
+        help="compare against a previous output file and exit with status 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, dest="tolerance",
+        help="relative slowdown or expansion increase allowed before reporting a regression")
+    args = parser.parse_args()
+
+    cases: List[Tuple[str, Tuple[GridGraph, List[int], List[int]]]] = []
+    for size in args.sizes:
+        for density in args.densities:
+            for agents in args.agents:
+                cases.append((f"random-{size}x{size}-{density}-{agents}-s{args.seed}",
+                    random_instance(size, size, density, agents, args.seed)))
+    for filename in collect_files(args.samples):
+        cases.append((filename, sample_instance(filename)))
+
+    options = {"solver": args.solver, "space_time": args.space_time, "window": args.window}
+    results = []
+    for name, (graph, start, goal) in cases:
+        for benchmark in args.benchmarks:
+            if benchmark == "distances" and graph.size > args.distances_max_cells:
+                continue
+            result = {"case": name, **measure(benchmark, graph, start, goal, args.repeats, args.warmup,
+                **(options if benchmark == "mapf" else {}))}
+            results.append(result)
+            print(f"{name:40} {benchmark:10} {result['wall_time']['median'] * 1000:9.2f}ms "
+                f"{str(result['expansions']):>9} exp {result['peak_memory'] / 1024:9.0f}KiB {result['success_rate']:7.1%}", file=sys.stderr)
+
+    report = {"options": options, "repeats": args.repeats, "warmup": args.warmup, "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
+    else:
+        json.dump(report, sys.stdout, indent=1)
+        print()
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
@@ -0,0 +1,150 @@
+import heapq
+import time
+from typing import Dict, FrozenSet, List, Tuple
+from graph import Graph
+from mapf import a_star_coop
+from reservations import ReservationTable
+from stats import SearchStats
+
+# A constraint forbids an agent from being on a node at time t (node, node, t), or from
+# moving origin -> destination and arriving at time t (origin, destination, t)
+Constraint = Tuple[int, int, int]
+
+DEFAULT_MAX_NODES = 10000
+
+class CTNode:
+    def __init__(self, constraints: Dict[int, FrozenSet[Constraint]], paths: Dict[int, List[int]]):
+        self.constraints = constraints
+        self.paths = paths
+        self.cost = sum(len(p) - 1 for p in paths.values())
+        self.conflicts = _count_conflicts(paths)
+
+def _position(path: List[int], t: int) -> int:
+    return path[t] if t < len(path) else path[-1]
+
+def _conflicts(paths: Dict[int, List[int]]):
+    # Yields (agent, agent, constraint, constraint) for every conflict in time order.
+    # Agents are considered to stay on their goal once their path ends.
+    makespan = max((len(p) for p in paths.values()), default=0)
+    for t in range(makespan):
+        occupied: Dict[int, int] = {}
+        moves: Dict[Tuple[int,int], int] = {}
+        for i, path in paths.items():
+            node = _position(path, t)
+            if node in occupied:
+                yield occupied[node], i, (node, node, t), (node, node, t)
+            occupied[node] = i
+            if t > 0:
+                prev = _position(path, t-1)
+                if prev != node:
+                    if (node, prev) in moves:
+                        j = moves[(node, prev)]
+                        yield j, i, (node, prev, t), (prev, node, t)
+                    moves[(prev, node)] = i
+
+def _count_conflicts(paths: Dict[int, List[int]]) -> int:
+    return sum(1 for _ in _conflicts(paths))
+
+def _constraint_table(constraints: FrozenSet[Constraint]) -> ReservationTable:
+    table = ReservationTable()
+    for origin, destination, t in constraints:
+        if origin == destination:
+            table.reserve_vertex(origin, t)
+        else:
+            # reserve_edge(a, b) forbids the opposite move b -> a
+            table.reserve_edge(destination, origin, t)
+    return table
+
+def cbs(graph: Graph, start: List[int], goal: List[int],
+    suboptimality = 1.0, max_nodes: int | None = DEFAULT_MAX_NODES,
+    time_limit: float | None = None, stats: SearchStats | None = None) -> List[List[int] | None]:
+    # Conflict-Based Search. With suboptimality > 1 the high level picks, among the open
+    # nodes within that factor of the lowest cost, the one with the fewest conflicts
+    # (ECBS-style focal search), so the sum of costs stays within the factor of optimal.
+    # When the node or time limit is hit first, the least conflicted node seen so far is
+    # made conflict-free (see _resolve) and counted in stats.limits.
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+
+    # low-level paths memoized across constraint-tree nodes
+    memo: Dict[Tuple[int, FrozenSet[Constraint]], List[int] | None] = {}
+    def low_level(agent: int, constraints: FrozenSet[Constraint]) -> List[int] | None:
+        key = (agent, constraints)
+        if key not in memo:
+            if stats is not None: stats.begin_agent(agent, constraints=len(constraints))
+            memo[key] = a_star_coop(graph, start[agent], goal[agent], _constraint_table(constraints), space_time=True, stats=stats)
+            if stats is not None: stats.end_agent(agent, memo[key])
+        return memo[key]
+
+    result: List[List[int] | None] = [None for _ in start]
+    root_paths: Dict[int, List[int]] = {}
+    for i, (s, g) in enumerate(zip(start, goal)):
+        # agents that can't reach their goal at all are left out
+        if not (0 <= s < graph.size and 0 <= g < graph.size):
+            continue
+        path = low_level(i, frozenset())
+        if path is not None:
+            root_paths[i] = path
+
+    root = CTNode({i: frozenset() for i in root_paths}, root_paths)
+    counter = 0
+    open_list = [(root.cost, root.conflicts, counter, root)]
+    expanded = 0
+    closest = root
+    while open_list != []:
+        if (max_nodes is not None and expanded >= max_nodes) or (deadline is not None and time.perf_counter() > deadline):
+            if stats is not None:
+                stats.limits += 1
+                stats.event("limit", expanded=expanded, conflicts=closest.conflicts)
+            return _resolve(graph, start, goal, closest.paths, stats)
+
+        if suboptimality > 1.0:
+            bound = open_list[0][0] * suboptimality
+            best = min((entry for entry in open_list if entry[0] <= bound), key=lambda e: (e[1], e[0], e[2]))
+            open_list.remove(best)
+            heapq.heapify(open_list)
+            node = best[3]
+        else:
+            node = heapq.heappop(open_list)[3]
+        expanded += 1
+        if stats is not None: stats.event("ct node", cost=node.cost, conflicts=node.conflicts)
+        if (node.conflicts, node.cost) < (closest.conflicts, closest.cost):
+            closest = node
+
+        conflict = next(_conflicts(node.paths), None)
+        if conflict is None:
+            for i, path in node.paths.items():
+                result[i] = path
+            return result
+
+        a, b, constraint_a, constraint_b = conflict
+        for agent, constraint in ((a, constraint_a), (b, constraint_b)):
+            constraints = node.constraints[agent] | {constraint}
+            path = low_level(agent, constraints)
+            if path is None:
+                continue
+            child = CTNode({**node.constraints, agent: constraints}, {**node.paths, agent: path})
+            counter += 1
+            heapq.heappush(open_list, (child.cost, child.conflicts, counter, child))
+    return result
+
+def _resolve(graph: Graph, start: List[int], goal: List[int], paths: Dict[int, List[int]],
+    stats: SearchStats | None = None) -> List[List[int] | None]:
+    # Keeps the largest set of paths, taken in agent order, that don't conflict with each
+    # other, then plans the remaining agents one by one around them (prioritized planning)
+    result: List[List[int] | None] = [None for _ in start]
+    kept: Dict[int, List[int]] = {}
+    for i in sorted(paths):
+        if next(_conflicts({**kept, i: paths[i]}), None) is None:
+            kept[i] = paths[i]
+    reservations = ReservationTable()
+    for i, path in kept.items():
+        result[i] = path
+        reservations.reserve_path(path)
+    for i in sorted(set(paths) - set(kept)):
+        if stats is not None: stats.begin_agent(i, resolve=True)
+        path = a_star_coop(graph, start[i], goal[i], reservations, space_time=True, stats=stats)
+        if stats is not None: stats.end_agent(i, path)
+        result[i] = path
+        if path:
+            reservations.reserve_path(path)
+    return result
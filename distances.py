@@ -0,0 +1,164 @@
+import argparse
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Dict, Iterable, List, Sequence
+
+from graph import Graph
+
+MAGIC = b"MAPFDST1"
+# magic, map hash, typecode, node count, target count; padded to HEADER_SIZE
+HEADER = struct.Struct("<8s20sc3xQQ")
+HEADER_SIZE = 64
+# the largest value of each type marks unreachable nodes
+UNREACHABLE = {"H": 0xFFFF, "I": 0xFFFFFFFF}
+
+def map_hash(graph: Graph) -> str:
+    # Identifies a map by its size and edges, so a saved table is never used for another map
+    digest = hashlib.sha1(struct.pack("<Q", graph.size))
+    buffer = array("d")
+    for origin, destination, cost in graph.edges():
+        buffer.extend((origin, destination, cost))
+        if len(buffer) >= 3 * 65536:
+            digest.update(buffer.tobytes())
+            buffer = array("d")
+    digest.update(buffer.tobytes())
+    return digest.hexdigest()
+
+class DistanceTable:
+    # Distances from every node to each of a set of targets, one row per target, stored as
+    # unsigned 16 or 32 bit integers. Tables loaded from disk are memory-mapped, so every
+    # process opening the same file shares a single copy.
+    def __init__(self, map_key: str, size: int, targets: List[int], typecode: str, matrix: Sequence[int], mm: mmap.mmap | None = None):
+        self.map_key = map_key
+        self.size = size
+        self.targets = targets
+        self.typecode = typecode
+        self._matrix = matrix
+        self._rows: Dict[int, int] = {t: i for i, t in enumerate(targets)}
+        self._unreachable = UNREACHABLE[typecode]
+        self._mm = mm
+
+    @classmethod
+    def compute(cls, graph: Graph, targets: Iterable[int] | None = None) -> "DistanceTable":
+        targets = sorted(set(range(graph.size) if targets is None else targets))
+        offsets, sources, weights = graph.reverse_adjacency()
+        # edges removed by a map update keep their slot with an infinite weight
+        unit = all(w == 1.0 or w == float("+inf") for w in weights)
+        size = graph.size
+        # Rows are computed one at a time and copied into a 16 bit matrix, which is only
+        # widened to 32 bits if a distance doesn't fit
+        matrix = array("H", [UNREACHABLE["H"]]) * (len(targets) * size)
+        for i, target in enumerate(targets):
+            row = array("I", [UNREACHABLE["I"]]) * size
+            if unit:
+                longest = _bfs(offsets, sources, weights, target, row)
+            else:
+                # weighted graphs go through the (exact) reverse Dijkstra instead
+                longest = 0
+                for node, d in enumerate(graph.distances_to(target)):
+                    if d == float("+inf"):
+                        continue
+                    if d != int(d):
+                        raise ValueError("Distance tables can only store integer distances")
+                    row[node] = int(d)
+                    longest = max(longest, int(d))
+            if matrix.typecode == "H" and longest >= UNREACHABLE["H"]:
+                matrix = array("I", (UNREACHABLE["I"] if d == UNREACHABLE["H"] else d for d in matrix))
+            matrix[i * size:(i + 1) * size] = row if matrix.typecode == "I" else _narrow(row)
+        return cls(map_hash(graph), size, targets, matrix.typecode, matrix)
+
+    def save(self, filename: str):
+        # written next to the destination and renamed, so readers never see a partial file
+        tmp = f"{filename}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(HEADER.pack(MAGIC, bytes.fromhex(self.map_key), self.typecode.encode(), self.size, len(self.targets)).ljust(HEADER_SIZE, b"\0"))
+            f.write(array("q", self.targets).tobytes())
+            f.write(memoryview(self._matrix).cast("B"))
+        os.replace(tmp, filename)
+
+    @classmethod
+    def load(cls, filename: str) -> "DistanceTable":
+        with open(filename, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, key, typecode, size, count = HEADER.unpack_from(mm)
+        if magic != MAGIC:
+            mm.close()
+            raise ValueError(f"{filename} is not a distance table")
+        typecode = typecode.decode()
+        targets_end = HEADER_SIZE + 8 * count
+        targets = list(memoryview(mm)[HEADER_SIZE:targets_end].cast("q"))
+        matrix = memoryview(mm)[targets_end:targets_end + count * size * array(typecode).itemsize].cast(typecode)
+        return cls(key.hex(), size, targets, typecode, matrix, mm)
+
+    def __contains__(self, target: int) -> bool:
+        return target in self._rows
+
+    def row(self, target: int) -> Sequence[int]:
+        i = self._rows[target]
+        return self._matrix[i * self.size:(i + 1) * self.size]
+
+    def distance(self, origin: int, target: int) -> float:
+        d = self._matrix[self._rows[target] * self.size + origin]
+        return float("+inf") if d == self._unreachable else d
+
+def _bfs(offsets: array, sources: array, weights: array, target: int, dist: array) -> int:
+    # Fills dist (unreachable everywhere) with the distances to target, returns the longest
+    unreachable = UNREACHABLE["I"]
+    dist[target] = 0
+    frontier = [target]
+    d = 0
+    while frontier != []:
+        d += 1
+        next_frontier = []
+        for node in frontier:
+            for i in range(offsets[node], offsets[node+1]):
+                adj = sources[i]
+                if dist[adj] == unreachable and weights[i] != float("+inf"):
+                    dist[adj] = d
+                    next_frontier.append(adj)
+        frontier = next_frontier
+    return d - 1
+
+def _narrow(row: array) -> array:
+    # The low 16 bits of every value of a 32 bit row, which maps UNREACHABLE["I"] to
+    # UNREACHABLE["H"]
+    halves = memoryview(row).cast("B").cast("H")
+    return array("H", halves[::2] if sys.byteorder == "little" else halves[1::2])
+
+def precompute(graph: Graph, targets: Iterable[int] | None = None, cache_dir: str | None = None) -> DistanceTable:
+    # Loads the table for this map and target set from cache_dir, computing and saving it
+    # first if needed, and attaches it to the graph
+    targets = sorted(set(range(graph.size) if targets is None else targets))
+    if cache_dir is None:
+        table = DistanceTable.compute(graph, targets)
+    else:
+        key = map_hash(graph)
+        targets_key = hashlib.sha1(array("q", targets).tobytes()).hexdigest()[:16]
+        filename = os.path.join(cache_dir, f"{key}-{targets_key}.dist")
+        if not os.path.exists(filename):
+            os.makedirs(cache_dir, exist_ok=True)
+            DistanceTable.compute(graph, targets).save(filename)
+        table = DistanceTable.load(filename)
+        if table.map_key != key or table.targets != targets:
+            raise ValueError(f"{filename} does not match this map")
+    graph.distance_table = table
+    return table
+
+if __name__ == "__main__":
+    from loader import read_grid
+
+    parser = argparse.ArgumentParser(description="Precompute the distance table of a grid file into a cache directory")
+    parser.add_argument("-f", "--file", default = "grid.txt", type=str, dest="file")
+    parser.add_argument("-d", "--cache-dir", default=".distances", dest="cache_dir")
+    parser.add_argument("-a", "--all", action="store_true", dest="all",
+        help="store distances to every node instead of only to the agents' goals")
+    args = parser.parse_args()
+
+    graph, agents = read_grid(args.file)
+    targets = None if args.all else [a.goal for a in agents.values() if 0 <= a.goal < graph.size]
+    table = precompute(graph, targets, args.cache_dir)
+    print(f"{len(table.targets)} targets x {table.size} nodes ({table.typecode}) for map {table.map_key}", file=sys.stderr)
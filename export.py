@@ -0,0 +1,221 @@
+import argparse
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import zipfile
+from array import array
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Set, TextIO, Tuple
+from xml.sax.saxutils import escape, quoteattr
+
+from graph import Graph, GridGraph
+
+# Lines (or array items) gathered before each write to the file
+CHUNK_SIZE = 65536
+FORMATS = ["dot", "graphml", "edges", "npz"]
+EXTENSIONS = {".gv": "dot", ".dot": "dot", ".graphml": "graphml", ".txt": "edges", ".edges": "edges", ".npz": "npz"}
+
+# (node, label, outgoing edges) as the writers receive them
+Item = Tuple[int, str, List[Tuple[int,float]]]
+
+def _label(graph: Graph, node: int) -> str:
+    if isinstance(graph, GridGraph):
+        x, y = graph.coords_from_id(node)
+        return f"{x},{y}"
+    return str(node + 1)
+
+def _select(graph: Graph, nodes: Iterable[int] | None, region: Tuple[int,int,int,int] | None) -> Iterator[Item]:
+    # Every selected node with its edges to other selected nodes, one at a time
+    wanted = None if nodes is None else set(nodes)
+    if region is not None:
+        if not isinstance(graph, GridGraph):
+            raise ValueError("a region can only be selected on a grid")
+        x0, y0, x1, y1 = _clip(graph, region)
+        candidates = (graph.id_from_coords(x, y) for y in range(y0, y1) for x in range(x0, x1))
+        def inside(n: int) -> bool:
+            x, y = graph.coords_from_id(n)
+            return x0 <= x < x1 and y0 <= y < y1 and (wanted is None or n in wanted)
+    else:
+        candidates = range(graph.size) if wanted is None else sorted(wanted)
+        inside = (lambda n: True) if wanted is None else wanted.__contains__
+    for n in candidates:
+        if wanted is not None and n not in wanted:
+            continue
+        yield n, _label(graph, n), [(adj, cost) for adj, cost in graph.neighbours(n) if cost != float("+inf") and inside(adj)]
+
+def _clip(graph: GridGraph, region: Tuple[int,int,int,int] | None) -> Tuple[int,int,int,int]:
+    if region is None:
+        return 0, 0, graph.dim_x, graph.dim_y
+    x0, y0, x1, y1 = region
+    return max(0, x0), max(0, y0), min(graph.dim_x, x1), min(graph.dim_y, y1)
+
+def _downsample(graph: GridGraph, region: Tuple[int,int,int,int] | None, stride: int) -> Iterator[Item]:
+    # Every stride x stride block of cells becomes one node, named after its top left cell,
+    # if any of its cells is free. Blocks are connected where any of their cells are.
+    x0, y0, x1, y1 = _clip(graph, region)
+    def block_of(n: int) -> int | None:
+        x, y = graph.coords_from_id(n)
+        if not (x0 <= x < x1 and y0 <= y < y1):
+            return None
+        return graph.id_from_coords(x0 + (x - x0) // stride * stride, y0 + (y - y0) // stride * stride)
+    # one row of blocks at a time
+    for by in range(y0, y1, stride):
+        blocks: Dict[int, Set[int]] = {}
+        for y in range(by, min(by + stride, y1)):
+            for x in range(x0, x1):
+                if graph.cells[y][x] == GridGraph.WALL_CHAR:
+                    continue
+                n = graph.id_from_coords(x, y)
+                block = block_of(n)
+                adjacent = blocks.setdefault(block, set())
+                for adj, cost in graph.neighbours(n):
+                    adj_block = block_of(adj) if cost != float("+inf") else None
+                    if adj_block is not None and adj_block != block:
+                        adjacent.add(adj_block)
+        for block in sorted(blocks):
+            yield block, _label(graph, block), [(adj, float(stride)) for adj in sorted(blocks[block])]
+
+def _chunked(f: TextIO, lines: Iterable[str]):
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= CHUNK_SIZE:
+            f.write("".join(buffer))
+            buffer = []
+    f.write("".join(buffer))
+
+def _dot_lines(items: Iterator[Item], comment: str, colors: List[str] | None, show_distances: bool, show_isolated: bool) -> Iterator[str]:
+    yield f"// {comment}\n"
+    yield "digraph {\n"
+    for n, label, edges in items:
+        if not show_isolated and edges == []:
+            continue
+        color = colors[n] if colors else "black"
+        yield f'\t{n} [label="{label}" color="{color}"]\n'
+        for adj, cost in edges:
+            yield f'\t{n} -> {adj} [label="{cost:.1f}"]\n' if show_distances else f"\t{n} -> {adj}\n"
+    yield "}\n"
+
+def _graphml_lines(items: Iterator[Item], comment: str, colors: List[str] | None, show_isolated: bool) -> Iterator[str]:
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+    yield '<key id="label" for="node" attr.name="label" attr.type="string"/>\n'
+    yield '<key id="color" for="node" attr.name="color" attr.type="string"/>\n'
+    yield '<key id="weight" for="edge" attr.name="weight" attr.type="double"/>\n'
+    yield f'<graph id={quoteattr(comment)} edgedefault="directed">\n'
+    for n, label, edges in items:
+        if not show_isolated and edges == []:
+            continue
+        color = colors[n] if colors else "black"
+        yield f'<node id="n{n}"><data key="label">{label}</data><data key="color">{escape(color)}</data></node>\n'
+        for adj, cost in edges:
+            yield f'<edge source="n{n}" target="n{adj}"><data key="weight">{cost}</data></edge>\n'
+    yield "</graph>\n</graphml>\n"
+
+def _edge_lines(items: Iterator[Item]) -> Iterator[str]:
+    yield "# source target weight\n"
+    for n, _, edges in items:
+        for adj, cost in edges:
+            yield f"{n} {adj} {cost}\n"
+
+def _npy_header(typecode: str, length: int) -> bytes:
+    # Header of a version 1.0 .npy file holding a one-dimensional array
+    descr = ("<" if sys.byteorder == "little" else ">") + {"q": "i8", "d": "f8"}[typecode]
+    header = f"{{'descr': '{descr}', 'fortran_order': False, 'shape': ({length},), }}"
+    header += " " * (-(len(header) + 11) % 64) + "\n"
+    return b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header)) + header.encode("latin1")
+
+def _write_npz(filename: str, items: Iterator[Item], show_isolated: bool):
+    # Same layout as numpy.savez(nodes=..., source=..., target=..., weight=...). Each array
+    # goes to a temporary file first, since its length is only known at the end.
+    columns = {"nodes": "q", "source": "q", "target": "q", "weight": "d"}
+    files: Dict[str, BinaryIO] = {name: tempfile.TemporaryFile() for name in columns}
+    buffers = {name: array(typecode) for name, typecode in columns.items()}
+    lengths = {name: 0 for name in columns}
+    def flush(name: str):
+        buffers[name].tofile(files[name])
+        lengths[name] += len(buffers[name])
+        buffers[name] = array(columns[name])
+    try:
+        for n, _, edges in items:
+            if not show_isolated and edges == []:
+                continue
+            buffers["nodes"].append(n)
+            for adj, cost in edges:
+                buffers["source"].append(n)
+                buffers["target"].append(adj)
+                buffers["weight"].append(cost)
+            if len(buffers["source"]) >= CHUNK_SIZE or len(buffers["nodes"]) >= CHUNK_SIZE:
+                for name in columns:
+                    flush(name)
+        for name in columns:
+            flush(name)
+        with zipfile.ZipFile(filename, "w", zipfile.ZIP_DEFLATED) as archive:
+            for name, typecode in columns.items():
+                with archive.open(f"{name}.npy", "w", force_zip64=True) as entry:
+                    entry.write(_npy_header(typecode, lengths[name]))
+                    files[name].seek(0)
+                    shutil.copyfileobj(files[name], entry)
+    finally:
+        for f in files.values():
+            f.close()
+
+def export_graph(graph: Graph, filename: str, format: str | None = None, nodes: Iterable[int] | None = None,
+    region: Tuple[int,int,int,int] | None = None, stride = 1, comment = "Graph", colors: List[str] | None = None,
+    show_distances = True, show_isolated = True):
+    # Writes graph to filename as it goes, so even the graphs of large maps never sit in
+    # memory as a whole. The format follows the extension unless given: DOT (.gv, .dot),
+    # GraphML (.graphml), a text edge list (.txt, .edges) or numpy arrays (.npz). Only the
+    # given nodes and the edges between them are written, and on a grid only the cells in
+    # region (x0, y0, x1, y1, ends excluded). A stride above 1 shrinks a grid by merging
+    # every stride x stride block of cells into one node.
+    if format is None:
+        format = EXTENSIONS.get(os.path.splitext(filename)[1].lower())
+        if format is None:
+            raise ValueError(f"can't tell the format of {filename}, pass one of {FORMATS}")
+    if format not in FORMATS:
+        raise ValueError(f"unknown format {format}, expected one of {FORMATS}")
+    if stride > 1:
+        if not isinstance(graph, GridGraph):
+            raise ValueError("only grids can be downsampled")
+        if nodes is not None:
+            raise ValueError("nodes can't be selected on a downsampled grid, select a region instead")
+        items = _downsample(graph, region, stride)
+    else:
+        items = _select(graph, nodes, region)
+    if os.path.dirname(filename):
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+    if format == "npz":
+        _write_npz(filename, items, show_isolated)
+        return
+    with open(filename, "w") as f:
+        if format == "dot":
+            _chunked(f, _dot_lines(items, comment, colors, show_distances, show_isolated))
+        elif format == "graphml":
+            _chunked(f, _graphml_lines(items, comment, colors, show_isolated))
+        else:
+            _chunked(f, _edge_lines(items))
+
+if __name__ == "__main__":
+    from loader import read_grid
+
+    parser = argparse.ArgumentParser(description="Write the graph of a grid file without rendering it")
+    parser.add_argument("-f", "--file", default = "grid.txt", type=str, dest="file",
+        help="use a specific file to initialize the grid")
+    parser.add_argument("-o", "--output", default="output/graph.gv", dest="output",
+        help="the file to write; its extension picks the format unless --format is given")
+    parser.add_argument("--format", choices=FORMATS, default=None, dest="format")
+    parser.add_argument("--region", type=int, nargs=4, default=None, dest="region", metavar=("X0", "Y0", "X1", "Y1"),
+        help="only export the cells with X0 <= x < X1 and Y0 <= y < Y1")
+    parser.add_argument("--stride", type=int, default=1, dest="stride",
+        help="merge every STRIDE x STRIDE block of cells into one node")
+    parser.add_argument("--no-distances", action="store_false", dest="show_distances",
+        help="leave the edge weights out of DOT labels")
+    parser.add_argument("--no-isolated", action="store_false", dest="show_isolated",
+        help="leave out nodes without edges, such as walls")
+    args = parser.parse_args()
+
+    graph, _ = read_grid(args.file)
+    export_graph(graph, args.output, args.format, region=args.region, stride=args.stride,
+        comment=args.file, show_distances=args.show_distances, show_isolated=args.show_isolated)
@@ -1,126 +1,585 @@
-from collections import defaultdict
-from typing import List, Dict, Tuple
-import heapq
-from typing_extensions import override
-import graphviz
-
-class Graph:
-    def __init__(self, n:int):
-        self._neighbours: Dict[int, List[Tuple[int,float]]] = defaultdict(list)
-        self.size = n
-        self._distances: Dict[int, Dict[int,float]] = {}
-        self.clear_distances()
-        
-    def clear_distances(self):
-        self._distances = defaultdict(dict)
-        for node in range(self.size):
-            self._distances[node][node] = 0
-            
-    def clear_edges(self):
-        self._neighbours = defaultdict(list)
-    
-    def add_edge(self, origin: int, destination: int, distance = 1.0):
-        self.remove_edges(origin, destination)
-        
-        self._neighbours[origin].append((destination, distance))
-        self.clear_distances()
-    
-    def remove_edges(self, origin, destination):
-        self._neighbours[origin] = list(filter(lambda t: t[0] != destination, self._neighbours[origin]))
-    
-    def add_edge_bidirectional(self, origin: int, destination: int, distance = 1.0):
-        self.add_edge(origin, destination, distance)
-        self.add_edge(destination, origin, distance)
-        
-    def neighbours(self, n:int) -> List[Tuple[int,float]]:
-        return self._neighbours[n]
-    
-    def _calculate_distances(self, origin: int):
-        self._distances[origin] = {n: float("+inf") for n in range(self.size)}
-        self._distances[origin][origin] = 0
-
-        # A queue initialized with all known distances from origin to destination
-        q = [(0, origin)]
-        heapq.heapify(q)
-        
-        while q != []:
-            dist, node = heapq.heappop(q)
-            
-            for adj, cost in self.neighbours(node):
-                new_dist = dist + cost
-                # if we found a better path to that node, don't go there
-                if self._distances[origin][adj] <= new_dist:
-                    continue
-                self._distances[origin][adj] = new_dist
-                heapq.heappush(q, (new_dist, adj))
-    
-    def calculate_distances(self):
-        for origin in range(self.size):
-            self._calculate_distances(origin)
-    
-    def distance(self, origin: int, destination: int) -> float:
-        if destination not in self._distances[origin]:
-            self._calculate_distances(origin)
-        return self._distances[origin][destination]
-    
-    def distance_heuristic(self, origin: int, destination: int) -> float:
-        return self.distance(origin, destination)
-    
-    def visualize(self, comment="Graph", colors:List[str]=None, show_distances=True, show_isolated=True):
-        print("Preprocessing...")
-        dot = graphviz.Digraph(comment=comment)
-        if not colors:
-            colors = ["black" for _ in range(self.size)]
-        
-        print("Adding nodes to the graph render")
-        for n in range(self.size):
-            if show_isolated or self.neighbours(n) != []:
-                dot.node(str(n), str(n+1), {"color":colors[n]})
-        print("Adding edges to the graph render")
-        for n in range(self.size):
-            for adj,d in self.neighbours(n):
-                dot.edge(str(n), str(adj),f"{d:.1f}" if show_distances else None)
-        print("Running graphviz renderer")
-        dot.render('output/graph.gv', view=True)
-        
-class GridGraph(Graph):
-    WALL_CHAR = "#"
-    
-    def __init__(self, dim_x: int, dim_y: int):
-        super().__init__(dim_x * dim_y)
-        self.cells = [[GridGraph.WALL_CHAR for _ in range(dim_x)] for _ in range(dim_y)]
-        self.dim_x = dim_x
-        self.dim_y = dim_y
-    
-    def id_from_coords(self, x:int, y:int):
-        return y * self.dim_x + x
-    def coords_from_id(self, id:int):
-        return (id % self.dim_x, id // self.dim_x)
-    
-    def load_cells(self, grid: List[str]):
-        self.cells = [[GridGraph.WALL_CHAR for _ in range(self.dim_x)] for _ in range(self.dim_y)]
-        self._neighbours = defaultdict(list) # Empty all data
-        for y,row in enumerate(grid[:self.dim_y]):
-            for x,c in enumerate(row[:self.dim_x]):
-                print(c,end="")
-                if c != GridGraph.WALL_CHAR:
-                    self.cells[y][x] = " "
-                    cell_id = self.id_from_coords(x, y)
-                    if y > 0 and self.cells[y-1][x] != GridGraph.WALL_CHAR:
-                        top_id = self.id_from_coords(x,y-1)
-                        self.add_edge_bidirectional(cell_id, top_id)
-                    if x > 0 and self.cells[y][x-1] != GridGraph.WALL_CHAR:
-                        left_id = self.id_from_coords(x-1,y)
-                        self.add_edge_bidirectional(cell_id, left_id)
-                        
-            print()
-        print()
-        print("v" * self.dim_x)
-        print()
-        print("\n".join("".join(row) for row in self.cells))
-                        
-    @override
-    def distance_heuristic(self, origin: int, destination: int) -> float:
-        x1,y1 = self.coords_from_id(origin)
-        x2,y2 = self.coords_from_id(destination)
-        return abs(x1-x2) + abs(y1-y2)
+from array import array
+from collections import OrderedDict, defaultdict
+from typing import Iterable, Iterator, List, Dict, Tuple
+import heapq
+from typing_extensions import override
+
+# Default memory budget (in bytes) for the per-goal heuristic tables
+HEURISTIC_CACHE_BYTES = 64 * 1024 * 1024
+
+class Graph:
+    def __init__(self, n:int):
+        self._neighbours: Dict[int, List[Tuple[int,float]]] = defaultdict(list)
+        # Compressed sparse row adjacency (offsets, targets, weights), set while frozen
+        self._csr: Tuple[array, array, array] | None = None
+        self.size = n
+        # Distances from an origin to every node, only for the origins asked about so far
+        self._distances: Dict[int, array] = {}
+        # Distances *to* a goal from every node, kept in LRU order
+        self.heuristic_cache_bytes = HEURISTIC_CACHE_BYTES
+        self._goal_distances: OrderedDict[int, array] = OrderedDict()
+        # Adjacency with every edge reversed (offsets, sources, weights), built on demand
+        self._reverse: Tuple[array, array, array] | None = None
+        # Edges added by unblock_node that have no slot in the reverse arrays, by destination
+        self._reverse_extra: Dict[int, List[Tuple[int,float]]] = {}
+        # Precomputed distances to a set of targets (see distances.precompute)
+        self.distance_table = None
+        self.clear_distances()
+        
+    def clear_distances(self):
+        self._distances = {}
+        self._goal_distances = OrderedDict()
+        self._reverse = None
+        self._reverse_extra = {}
+        # a precomputed table no longer matches once the edges change
+        self.distance_table = None
+            
+    def clear_edges(self):
+        self._neighbours = defaultdict(list)
+        self._csr = None
+        self._reverse = None
+        self._reverse_extra = {}
+    
+    def __getstate__(self):
+        # Only the edges are sent to other processes, the caches are rebuilt there on demand
+        # (a memory-mapped distance table can't be pickled anyway)
+        state = self.__dict__.copy()
+        state["_distances"] = {}
+        state["_goal_distances"] = OrderedDict()
+        state["_reverse"] = None
+        state["_reverse_extra"] = {}
+        state["distance_table"] = None
+        return state
+    
+    @property
+    def frozen(self) -> bool:
+        return self._csr is not None
+    
+    @property
+    def csr(self) -> Tuple[array, array, array] | None:
+        # The packed (offsets, targets, weights) adjacency while frozen, None otherwise.
+        # Searches read it directly rather than building a neighbour list per node.
+        return self._csr
+    
+    def freeze(self):
+        # Pack the adjacency lists into flat arrays. Edges can't be added until the graph
+        # is thawed, but block_node and unblock_node still work (see there).
+        if self._csr is not None:
+            return
+        offsets = array("q", [0])
+        targets = array("l")
+        weights = array("d")
+        for node in range(self.size):
+            for adj, cost in self._neighbours.get(node, ()):
+                targets.append(adj)
+                weights.append(cost)
+            offsets.append(len(targets))
+        self._csr = (offsets, targets, weights)
+        self._neighbours = defaultdict(list)
+    
+    def thaw(self):
+        if self._csr is None:
+            return
+        offsets, targets, weights = self._csr
+        self._neighbours = defaultdict(list)
+        for node in range(self.size):
+            lo, hi = offsets[node], offsets[node+1]
+            if lo != hi:
+                self._neighbours[node] = [(adj, cost) for adj, cost in zip(targets[lo:hi], weights[lo:hi]) if cost != float("+inf")]
+        self._csr = None
+    
+    def _slot(self, origin: int, destination: int) -> int | None:
+        # Index of the edge origin -> destination in the packed arrays of a frozen graph
+        offsets, targets, _ = self._csr
+        for i in range(offsets[origin], offsets[origin+1]):
+            if targets[i] == destination:
+                return i
+        return None
+    
+    def _check_mutable(self):
+        if self._csr is not None:
+            raise RuntimeError("Cannot modify a frozen graph, call thaw() first")
+    
+    def add_edge(self, origin: int, destination: int, distance = 1.0):
+        self._check_mutable()
+        self.remove_edges(origin, destination)
+        
+        self._neighbours[origin].append((destination, distance))
+        self.clear_distances()
+    
+    def remove_edges(self, origin, destination):
+        self._check_mutable()
+        self._neighbours[origin] = list(filter(lambda t: t[0] != destination, self._neighbours[origin]))
+    
+    def add_edge_bidirectional(self, origin: int, destination: int, distance = 1.0):
+        self.add_edge(origin, destination, distance)
+        self.add_edge(destination, origin, distance)
+    
+    def add_edges(self, edges: Iterable[Tuple[int,int,float]], bidirectional = False):
+        # Same result as calling add_edge for every edge (a later edge between the same
+        # nodes replaces an earlier one), but each touched adjacency list is rebuilt once
+        # and the distance cache is only invalidated at the end.
+        self._check_mutable()
+        touched: Dict[int, Dict[int,float]] = {}
+        def insert(origin: int, destination: int, distance: float):
+            if origin not in touched:
+                touched[origin] = dict(self._neighbours[origin])
+            adj = touched[origin]
+            adj.pop(destination, None)
+            adj[destination] = distance
+        
+        for origin, destination, distance in edges:
+            insert(origin, destination, distance)
+            if bidirectional:
+                insert(destination, origin, distance)
+        for origin, adj in touched.items():
+            self._neighbours[origin] = list(adj.items())
+        self.clear_distances()
+    
+    @classmethod
+    def from_edges(cls, n: int, edges: Iterable[Tuple[int,int,float]], bidirectional = False) -> "Graph":
+        graph = cls(n)
+        graph.add_edges(edges, bidirectional)
+        return graph
+        
+    def neighbours(self, n:int) -> List[Tuple[int,float]]:
+        if self._csr is not None:
+            offsets, targets, weights = self._csr
+            lo, hi = offsets[n], offsets[n+1]
+            # edges removed by block_node keep their slot with an infinite weight
+            return [(adj, cost) for adj, cost in zip(targets[lo:hi], weights[lo:hi]) if cost != float("+inf")]
+        return self._neighbours[n]
+    
+    def edges(self) -> Iterator[Tuple[int,int,float]]:
+        if self._csr is not None:
+            offsets, targets, weights = self._csr
+            for node in range(self.size):
+                for i in range(offsets[node], offsets[node+1]):
+                    yield (node, targets[i], weights[i])
+            return
+        for node in range(self.size):
+            for adj, cost in self._neighbours.get(node, ()):
+                yield (node, adj, cost)
+    
+    def _calculate_distances(self, origin: int):
+        distances = array("d", [float("+inf")]) * self.size
+        distances[origin] = 0
+        self._distances[origin] = distances
+
+        # A queue initialized with all known distances from origin to destination
+        q = [(0, origin)]
+        heapq.heapify(q)
+        
+        if self._csr is not None:
+            # Read the packed arrays directly instead of building neighbour lists
+            offsets, targets, weights = self._csr
+            while q != []:
+                dist, node = heapq.heappop(q)
+                for i in range(offsets[node], offsets[node+1]):
+                    adj = targets[i]
+                    new_dist = dist + weights[i]
+                    if distances[adj] <= new_dist:
+                        continue
+                    distances[adj] = new_dist
+                    heapq.heappush(q, (new_dist, adj))
+            return
+        
+        while q != []:
+            dist, node = heapq.heappop(q)
+            
+            for adj, cost in self.neighbours(node):
+                new_dist = dist + cost
+                # if we found a better path to that node, don't go there
+                if distances[adj] <= new_dist:
+                    continue
+                distances[adj] = new_dist
+                heapq.heappush(q, (new_dist, adj))
+    
+    def calculate_distances(self):
+        for origin in range(self.size):
+            self._calculate_distances(origin)
+    
+    def distance(self, origin: int, destination: int) -> float:
+        if origin == destination:
+            return 0
+        if origin not in self._distances:
+            self._calculate_distances(origin)
+        return self._distances[origin][destination]
+    
+    def reverse_adjacency(self) -> Tuple[array, array, array]:
+        # rebuilt once map updates added edges that the arrays have no slot for
+        if self._reverse is None or self._reverse_extra:
+            # Counting sort of all edges by destination
+            offsets = array("q", [0] * (self.size + 1))
+            for _, adj, _ in self.edges():
+                offsets[adj+1] += 1
+            for node in range(self.size):
+                offsets[node+1] += offsets[node]
+            fill = array("q", offsets[:-1])
+            sources = array("l", [0] * offsets[-1])
+            weights = array("d", [0.0] * offsets[-1])
+            for node, adj, cost in self.edges():
+                sources[fill[adj]] = node
+                weights[fill[adj]] = cost
+                fill[adj] += 1
+            self._reverse = (offsets, sources, weights)
+            self._reverse_extra = {}
+        return self._reverse
+    
+    def distances_to(self, goal: int) -> array:
+        # Exact distance from every node to goal, from a single Dijkstra over the reversed edges
+        table = self._goal_distances.get(goal)
+        if table is not None:
+            self._goal_distances.move_to_end(goal)
+            return table
+        
+        if self._reverse is None:
+            self.reverse_adjacency()
+        offsets, sources, weights = self._reverse
+        extra = self._reverse_extra
+        table = array("d", [float("+inf")]) * self.size
+        table[goal] = 0
+        q = [(0, goal)]
+        while q != []:
+            dist, node = heapq.heappop(q)
+            if dist > table[node]:
+                continue
+            for i in range(offsets[node], offsets[node+1]):
+                adj = sources[i]
+                new_dist = dist + weights[i]
+                if table[adj] <= new_dist:
+                    continue
+                table[adj] = new_dist
+                heapq.heappush(q, (new_dist, adj))
+            for adj, cost in extra.get(node, ()):
+                new_dist = dist + cost
+                if table[adj] <= new_dist:
+                    continue
+                table[adj] = new_dist
+                heapq.heappush(q, (new_dist, adj))
+        
+        self._goal_distances[goal] = table
+        # Evict the least recently used goals, always keeping the one just computed
+        entry_bytes = table.itemsize * self.size
+        while len(self._goal_distances) > 1 and len(self._goal_distances) * entry_bytes > self.heuristic_cache_bytes:
+            self._goal_distances.popitem(last=False)
+        return table
+    
+    def _incoming(self, node: int) -> List[Tuple[int,float]]:
+        if self._reverse is None:
+            self.reverse_adjacency()
+        offsets, sources, weights = self._reverse
+        # removed edges keep their slot with an infinite weight
+        incoming = [(sources[i], weights[i]) for i in range(offsets[node], offsets[node+1]) if weights[i] != float("+inf")]
+        return incoming + self._reverse_extra.get(node, [])
+    
+    def _set_reverse_weight(self, origin: int, destination: int, cost: float):
+        # Patches one edge of the reverse adjacency in place, an infinite cost removes it
+        if self._reverse is None:
+            return
+        extra = self._reverse_extra.get(destination, [])
+        for i, (adj, _) in enumerate(extra):
+            if adj == origin:
+                del extra[i]
+                break
+        offsets, sources, weights = self._reverse
+        for i in range(offsets[destination], offsets[destination+1]):
+            if sources[i] == origin:
+                weights[i] = cost
+                return
+        if cost != float("+inf"):
+            self._reverse_extra.setdefault(destination, []).append((origin, cost))
+    
+    def _update_distances(self, node: int, incoming: List[Tuple[int,float]], outgoing: List[Tuple[int,float]], blocked: bool):
+        # Drops the cached distances that blocking (or unblocking) node changes and patches
+        # the entry of node itself in the others. Paths from an origin enter node over the
+        # incoming edges and leave over the outgoing ones; paths to a goal the other way round.
+        for origin, row in list(self._distances.items()):
+            if origin == node:
+                stale = True
+            elif blocked:
+                stale = _passes_through(row, node, outgoing)
+                if not stale: row[node] = float("+inf")
+            else:
+                d = _distance_through(row, node, incoming, outgoing)
+                stale = d is None
+                if not stale: row[node] = d
+            if stale:
+                del self._distances[origin]
+        
+        for goal, table in list(self._goal_distances.items()):
+            if goal == node:
+                stale = True
+            elif blocked:
+                stale = _passes_through(table, node, incoming)
+                if not stale: table[node] = float("+inf")
+            else:
+                d = _distance_through(table, node, outgoing, incoming)
+                stale = d is None
+                if not stale: table[node] = d
+            if stale:
+                del self._goal_distances[goal]
+        
+        if self.distance_table is not None:
+            # precomputed tables are read-only: keep one only if none of its rows changes
+            # (a stale finite distance to a blocked node still never overestimates)
+            involved = {node} | {adj for adj, _ in incoming} | {adj for adj, _ in outgoing}
+            for target in self.distance_table.targets:
+                row = {n: self.distance_table.distance(n, target) for n in involved}
+                if target == node:
+                    stale = True
+                elif blocked:
+                    stale = _passes_through(row, node, incoming)
+                else:
+                    stale = _distance_through(row, node, outgoing, incoming) != row[node]
+                if stale:
+                    self.distance_table = None
+                    break
+    
+    def block_node(self, node: int) -> List[Tuple[int,int,float]]:
+        # Removes every edge into and out of node. Unlike remove_edges, only the cached
+        # distances whose shortest paths used node are dropped. Returns the removed edges,
+        # so unblock_node can put them back. On a frozen graph the removed edges keep their
+        # slot in the packed arrays with an infinite weight.
+        incoming = [(adj, cost) for adj, cost in self._incoming(node) if adj != node]
+        outgoing = [(adj, cost) for adj, cost in self.neighbours(node) if adj != node]
+        self._update_distances(node, incoming, outgoing, blocked=True)
+        for adj, _ in incoming:
+            if self._csr is not None:
+                self._csr[2][self._slot(adj, node)] = float("+inf")
+            else:
+                self._neighbours[adj] = [(n, cost) for n, cost in self._neighbours[adj] if n != node]
+            self._set_reverse_weight(adj, node, float("+inf"))
+        if self._csr is not None:
+            offsets, _, weights = self._csr
+            for i in range(offsets[node], offsets[node+1]):
+                weights[i] = float("+inf")
+            leaving = outgoing
+        else:
+            leaving = self._neighbours.pop(node, ())
+        for adj, cost in leaving:
+            self._set_reverse_weight(node, adj, float("+inf"))
+        return [(adj, node, cost) for adj, cost in incoming] + [(node, adj, cost) for adj, cost in outgoing]
+    
+    def unblock_node(self, node: int, edges: Iterable[Tuple[int,int,float]]):
+        # Adds edges into and out of node, e.g. the ones block_node returned, keeping the
+        # cached distances that no new path improves on. A frozen graph gets the edges back
+        # in their slots, and is only thawed for edges it never had.
+        edges = list(edges)
+        if self._csr is not None and any(self._slot(origin, destination) is None for origin, destination, _ in edges):
+            self.thaw()
+        if self._reverse is None:
+            self.reverse_adjacency()
+        replaced = False
+        for origin, destination, cost in edges:
+            if node not in (origin, destination):
+                raise ValueError(f"Edge {origin} -> {destination} does not touch node {node}")
+            if self._csr is not None:
+                weights = self._csr[2]
+                i = self._slot(origin, destination)
+                replaced = replaced or weights[i] not in (cost, float("+inf"))
+                weights[i] = cost
+                self._set_reverse_weight(origin, destination, cost)
+                continue
+            adj = self._neighbours[origin]
+            kept = [(n, c) for n, c in adj if n != destination]
+            # a changed weight may also make paths longer, which isn't tracked
+            replaced = replaced or any(c != cost for n, c in adj if n == destination)
+            self._neighbours[origin] = kept + [(destination, cost)]
+            self._set_reverse_weight(origin, destination, cost)
+        if replaced:
+            self.clear_distances()
+            return
+        incoming = [(adj, cost) for adj, cost in self._incoming(node) if adj != node]
+        outgoing = [(adj, cost) for adj, cost in self.neighbours(node) if adj != node]
+        self._update_distances(node, incoming, outgoing, blocked=False)
+    
+    def distance_heuristic(self, origin: int, destination: int) -> float:
+        if self.distance_table is not None and destination in self.distance_table:
+            return self.distance_table.distance(origin, destination)
+        return self.distances_to(destination)[origin]
+    
+    def visualize(self, comment="Graph", colors:List[str]=None, show_distances=True, show_isolated=True,
+        filename="output/graph.gv", view=True):
+        # Writes the graph as DOT with the streaming exporter, then renders and opens a pdf
+        # of it with graphviz. Without view, nothing is rendered (or imported) at all.
+        from export import export_graph
+        print("Writing the graph to", filename)
+        export_graph(self, filename, "dot", comment=comment, colors=colors,
+            show_distances=show_distances, show_isolated=show_isolated)
+        if not view:
+            return
+        # only needed here, so loading and planning don't depend on graphviz
+        import graphviz
+        print("Running graphviz renderer")
+        graphviz.view(graphviz.render("dot", "pdf", filename))
+        
+def _passes_through(row, node: int, leaving: List[Tuple[int,float]]) -> bool:
+    # Whether a shortest path in row (distances from or to one node) may continue from
+    # node over one of the leaving edges
+    d = row[node]
+    return d != float("+inf") and any(row[adj] == d + cost for adj, cost in leaving)
+
+def _distance_through(row, node: int, entering: List[Tuple[int,float]], leaving: List[Tuple[int,float]]) -> float | None:
+    # The distance of node once the entering edges are usable, or None if node then also
+    # shortens the distance of a node after it and the whole row has to be recomputed
+    d = min([row[node]] + [row[adj] + cost for adj, cost in entering])
+    if any(d + cost < row[adj] for adj, cost in leaving):
+        return None
+    return d
+
+class WallBitmap:
+    # The free cells of a grid packed into one integer per row (bit x is set when cell x is
+    # free), so runs of cells can be scanned with a few integer operations. Also keeps, per
+    # row and direction, the cells where a horizontal move gains a vertical neighbour that
+    # the cell behind it doesn't have.
+    def __init__(self, cells: List[List[str]]):
+        self.dim_x = len(cells[0]) if cells else 0
+        self.dim_y = len(cells)
+        self.rows = [int("".join("0" if c == GridGraph.WALL_CHAR else "1" for c in reversed(row)) or "0", 2) for row in cells]
+        self._forced_right = [0 for _ in range(self.dim_y)]
+        self._forced_left = [0 for _ in range(self.dim_y)]
+        for y in range(self.dim_y):
+            self._update_forced(y)
+    
+    def _update_forced(self, y: int):
+        right = left = 0
+        for adj in (y-1, y+1):
+            if 0 <= adj < self.dim_y:
+                row = self.rows[adj]
+                right |= row & ~(row << 1)
+                left |= row & ~(row >> 1)
+        self._forced_right[y] = right
+        self._forced_left[y] = left
+    
+    def is_free(self, x: int, y: int) -> bool:
+        return 0 <= x < self.dim_x and 0 <= y < self.dim_y and (self.rows[y] >> x) & 1 == 1
+    
+    def set_free(self, x: int, y: int, free: bool):
+        if free:
+            self.rows[y] |= 1 << x
+        else:
+            self.rows[y] &= ~(1 << x)
+        for adj in (y-1, y+1):
+            if 0 <= adj < self.dim_y:
+                self._update_forced(adj)
+    
+    def scan(self, x: int, y: int, dx: int, stop_x: int = -1) -> int | None:
+        # Moves from (x, y) along the row in direction dx and returns the first cell with a
+        # new vertical neighbour, or stop_x, whichever comes first. None if a wall or the
+        # edge of the map comes first.
+        row = self.rows[y]
+        if dx > 0:
+            # ~row is negative: everything past the right edge counts as a wall
+            stops = (~row | self._forced_right[y]) >> (x + 1)
+            if stop_x > x:
+                stops |= 1 << (stop_x - x - 1)
+            found = x + (stops & -stops).bit_length()
+        else:
+            stops = (~row | self._forced_left[y]) & ((1 << x) - 1)
+            if 0 <= stop_x < x:
+                stops |= 1 << stop_x
+            if stops == 0:
+                return None
+            found = stops.bit_length() - 1
+        return found if found < self.dim_x and (row >> found) & 1 == 1 else None
+
+class GridGraph(Graph):
+    WALL_CHAR = "#"
+    
+    def __init__(self, dim_x: int, dim_y: int):
+        super().__init__(dim_x * dim_y)
+        self.cells = [[GridGraph.WALL_CHAR for _ in range(dim_x)] for _ in range(dim_y)]
+        self.dim_x = dim_x
+        self.dim_y = dim_y
+        # built on first use, see wall_bitmap
+        self._bitmap: WallBitmap | None = None
+        # Cluster abstraction for hierarchical planning (see hpa.hierarchy_of)
+        self.hierarchy = None
+    
+    def id_from_coords(self, x:int, y:int):
+        return y * self.dim_x + x
+    def coords_from_id(self, id:int):
+        return (id % self.dim_x, id // self.dim_x)
+    
+    @classmethod
+    def from_grid(cls, grid: List[str]) -> "GridGraph":
+        graph = cls(max((len(row) for row in grid), default=0), len(grid))
+        graph.build_cells(grid)
+        return graph
+    
+    def build_cells(self, grid: List[str]):
+        # Silent, linear-time counterpart of load_cells
+        self.cells = [[GridGraph.WALL_CHAR for _ in range(self.dim_x)] for _ in range(self.dim_y)]
+        self._bitmap = None
+        self.hierarchy = None
+        self.clear_edges()
+        neighbours = self._neighbours
+        for y,row in enumerate(grid[:self.dim_y]):
+            cells_row = self.cells[y]
+            above = self.cells[y-1] if y > 0 else None
+            for x,c in enumerate(row[:self.dim_x]):
+                if c == GridGraph.WALL_CHAR:
+                    continue
+                cells_row[x] = " "
+                cell_id = self.id_from_coords(x, y)
+                # Cells are scanned top to bottom and left to right, so every edge is
+                # seen exactly once and can be appended without a duplicate check
+                if above is not None and above[x] != GridGraph.WALL_CHAR:
+                    top_id = cell_id - self.dim_x
+                    neighbours[cell_id].append((top_id, 1.0))
+                    neighbours[top_id].append((cell_id, 1.0))
+                if x > 0 and cells_row[x-1] != GridGraph.WALL_CHAR:
+                    left_id = cell_id - 1
+                    neighbours[cell_id].append((left_id, 1.0))
+                    neighbours[left_id].append((cell_id, 1.0))
+        self.clear_distances()
+    
+    def load_cells(self, grid: List[str]):
+        self.build_cells(grid)
+        for row in grid[:self.dim_y]:
+            print(row[:self.dim_x])
+        print()
+        print("v" * self.dim_x)
+        print()
+        print("\n".join("".join(row) for row in self.cells))
+                        
+    def block_cell(self, x: int, y: int) -> List[Tuple[int,int,float]]:
+        # Turns the cell into a wall, see Graph.block_node
+        self.cells[y][x] = GridGraph.WALL_CHAR
+        if self._bitmap is not None:
+            self._bitmap.set_free(x, y, False)
+        removed = self.block_node(self.id_from_coords(x, y))
+        if self.hierarchy is not None:
+            self.hierarchy.update_cell(x, y)
+        return removed
+    
+    def unblock_cell(self, x: int, y: int):
+        # Opens the cell again and connects it to its walkable neighbours. A frozen grid is
+        # thawed if the cell was already a wall when it was frozen (see Graph.unblock_node).
+        cell_id = self.id_from_coords(x, y)
+        edges = []
+        for adj_x, adj_y in ((x, y-1), (x-1, y), (x+1, y), (x, y+1)):
+            if 0 <= adj_x < self.dim_x and 0 <= adj_y < self.dim_y and self.cells[adj_y][adj_x] != GridGraph.WALL_CHAR:
+                adj = self.id_from_coords(adj_x, adj_y)
+                edges += [(cell_id, adj, 1.0), (adj, cell_id, 1.0)]
+        self.cells[y][x] = " "
+        if self._bitmap is not None:
+            self._bitmap.set_free(x, y, True)
+        self.unblock_node(cell_id, edges)
+        if self.hierarchy is not None:
+            self.hierarchy.update_cell(x, y)
+    
+    def wall_bitmap(self) -> WallBitmap:
+        if self._bitmap is None:
+            self._bitmap = WallBitmap(self.cells)
+        return self._bitmap
+                        
+    @override
+    def distance_heuristic(self, origin: int, destination: int) -> float:
+        # exact when a precomputed table covers the destination, Manhattan otherwise
+        if self.distance_table is not None and destination in self.distance_table:
+            return self.distance_table.distance(origin, destination)
+        x1,y1 = self.coords_from_id(origin)
+        x2,y2 = self.coords_from_id(destination)
+        return abs(x1-x2) + abs(y1-y2)
@@ -0,0 +1,265 @@
+import heapq
+import math
+from typing import Dict, List, Set, Tuple
+
+from graph import GridGraph
+from mapf import a_star_space_time
+from reservations import ReservationTable
+from stats import SearchStats
+
+DEFAULT_CLUSTER_SIZE = 16
+# border runs at least this long get a transition at each end instead of one in the middle
+LONG_ENTRANCE = 6
+# Abstract paths are refined a few cluster borders at a time. Going through the transition
+# of every border bends the path towards it, so longer segments give shorter paths.
+SEGMENT_BORDERS = 3
+
+class _Corridor:
+    # The grid restricted to a set of clusters, searchable like the graph itself
+    def __init__(self, hierarchy: "Hierarchy", clusters: Set[int]):
+        self.graph = hierarchy.graph
+        self.size = hierarchy.graph.size
+        self._cluster_of = hierarchy.cluster_of
+        self._clusters = clusters
+
+    def neighbours(self, n: int) -> List[Tuple[int,float]]:
+        return [(adj, cost) for adj, cost in self.graph.neighbours(n) if self._cluster_of(adj) in self._clusters]
+
+    def distance_heuristic(self, origin: int, destination: int) -> float:
+        return self.graph.distance_heuristic(origin, destination)
+
+class Hierarchy:
+    # HPA*: the grid is cut into square clusters. Wherever two clusters share a run of
+    # free cells, one or two transitions (a cell on each side) connect them. Each
+    # cluster's transition cells are linked by their distances inside the cluster,
+    # computed the first time a search reaches the cluster (or all at once by
+    # precompute). Queries search this small abstract graph and then run the space-time
+    # search, reservations included, only inside the clusters the abstract path crosses.
+    def __init__(self, graph: GridGraph, cluster_size = DEFAULT_CLUSTER_SIZE):
+        self.graph = graph
+        self.cluster_size = cluster_size
+        self.clusters_x = math.ceil(graph.dim_x / cluster_size)
+        self.clusters_y = math.ceil(graph.dim_y / cluster_size)
+        # transition cell -> the cells it's connected to in neighbouring clusters
+        self._partners: Dict[int, Set[int]] = {}
+        # (cluster, cluster) -> transitions on their shared border
+        self._borders: Dict[Tuple[int,int], List[Tuple[int,int]]] = {}
+        # cluster -> transition cell -> (transition cell, distance) within the cluster
+        self._intra: Dict[int, Dict[int, List[Tuple[int,float]]]] = {}
+        for cy in range(self.clusters_y):
+            for cx in range(self.clusters_x):
+                c = cy * self.clusters_x + cx
+                if cx + 1 < self.clusters_x:
+                    self._scan_border(c, c + 1)
+                if cy + 1 < self.clusters_y:
+                    self._scan_border(c, c + self.clusters_x)
+
+    def cluster_of(self, node: int) -> int:
+        x, y = self.graph.coords_from_id(node)
+        return (y // self.cluster_size) * self.clusters_x + x // self.cluster_size
+
+    def _bounds(self, cluster: int) -> Tuple[int,int,int,int]:
+        cy, cx = divmod(cluster, self.clusters_x)
+        x0, y0 = cx * self.cluster_size, cy * self.cluster_size
+        return x0, y0, min(x0 + self.cluster_size, self.graph.dim_x), min(y0 + self.cluster_size, self.graph.dim_y)
+
+    def _scan_border(self, a: int, b: int):
+        # (Re)places the transitions between cluster a and the cluster b right or below it
+        for u, v in self._borders.pop((a, b), []):
+            self._partners[u].discard(v)
+            self._partners[v].discard(u)
+        x0, y0, x1, y1 = self._bounds(a)
+        free = self.graph.wall_bitmap().is_free
+        if b == a + 1:
+            pairs = [((x1 - 1, y), (x1, y)) for y in range(y0, y1)]
+        else:
+            pairs = [((x, y1 - 1), (x, y1)) for x in range(x0, x1)]
+        runs: List[List[Tuple[int,int]]] = []
+        previous = False
+        for u, v in pairs:
+            open_pair = free(*u) and free(*v)
+            if open_pair:
+                if not previous:
+                    runs.append([])
+                runs[-1].append((self.graph.id_from_coords(*u), self.graph.id_from_coords(*v)))
+            previous = open_pair
+        transitions = []
+        for run in runs:
+            if len(run) < LONG_ENTRANCE:
+                transitions.append(run[len(run) // 2])
+            else:
+                transitions += [run[0], run[-1]]
+        for u, v in transitions:
+            self._partners.setdefault(u, set()).add(v)
+            self._partners.setdefault(v, set()).add(u)
+        self._borders[(a, b)] = transitions
+        self._intra.pop(a, None)
+        self._intra.pop(b, None)
+
+    def _entrances(self, cluster: int) -> List[int]:
+        x0, y0, x1, y1 = self._bounds(cluster)
+        entrances = set()
+        for neighbour in (cluster - 1, cluster - self.clusters_x):
+            for u, v in self._borders.get((neighbour, cluster), []):
+                entrances.add(v)
+        for neighbour in (cluster + 1, cluster + self.clusters_x):
+            for u, v in self._borders.get((cluster, neighbour), []):
+                entrances.add(u)
+        return sorted(entrances)
+
+    def _distances_in(self, cluster: int, source: int) -> Dict[int, int]:
+        # BFS from source without leaving the cluster, straight on the wall bitmap
+        x0, y0, x1, y1 = self._bounds(cluster)
+        rows = self.graph.wall_bitmap().rows
+        dim_x = self.graph.dim_x
+        dist = {source: 0}
+        frontier = [self.graph.coords_from_id(source)]
+        d = 0
+        while frontier != []:
+            d += 1
+            next_frontier = []
+            for x, y in frontier:
+                for adj_x, adj_y in ((x, y-1), (x-1, y), (x+1, y), (x, y+1)):
+                    if x0 <= adj_x < x1 and y0 <= adj_y < y1 and (rows[adj_y] >> adj_x) & 1:
+                        adj = adj_y * dim_x + adj_x
+                        if adj not in dist:
+                            dist[adj] = d
+                            next_frontier.append((adj_x, adj_y))
+            frontier = next_frontier
+        return dist
+
+    def _intra_edges(self, cluster: int) -> Dict[int, List[Tuple[int,float]]]:
+        edges = self._intra.get(cluster)
+        if edges is None:
+            entrances = self._entrances(cluster)
+            edges = {}
+            for u in entrances:
+                dist = self._distances_in(cluster, u)
+                edges[u] = [(v, dist[v]) for v in entrances if v != u and v in dist]
+            self._intra[cluster] = edges
+        return edges
+
+    def precompute(self):
+        for cluster in range(self.clusters_x * self.clusters_y):
+            self._intra_edges(cluster)
+
+    def update_cell(self, x: int, y: int):
+        # Called once cell (x, y) became a wall or free: redoes the borders it lies on and
+        # forgets the distances inside its cluster
+        cluster = self.cluster_of(self.graph.id_from_coords(x, y))
+        x0, y0, x1, y1 = self._bounds(cluster)
+        if x == x0 and x0 > 0:
+            self._scan_border(cluster - 1, cluster)
+        if x == x1 - 1 and x1 < self.graph.dim_x:
+            self._scan_border(cluster, cluster + 1)
+        if y == y0 and y0 > 0:
+            self._scan_border(cluster - self.clusters_x, cluster)
+        if y == y1 - 1 and y1 < self.graph.dim_y:
+            self._scan_border(cluster, cluster + self.clusters_x)
+        self._intra.pop(cluster, None)
+
+    def abstract_path(self, start: int, goal: int, stats: SearchStats | None = None) -> List[int] | None:
+        # The transition cells a shortest path from start to goal goes through, start and
+        # goal included, found with A* over the abstract graph
+        start_cluster, goal_cluster = self.cluster_of(start), self.cluster_of(goal)
+        from_start = self._distances_in(start_cluster, start)
+        to_goal = self._distances_in(goal_cluster, goal)
+        start_edges = [(v, from_start[v]) for v in self._entrances(start_cluster) if v in from_start]
+        if goal in from_start:
+            start_edges.append((goal, from_start[goal]))
+
+        def neighbours(node: int) -> List[Tuple[int,float]]:
+            result = start_edges if node == start else []
+            if node in self._partners:
+                result = result + self._intra_edges(self.cluster_of(node)).get(node, [])
+                result = result + [(v, 1) for v in self._partners[node]]
+            if node in to_goal and node != start:
+                result = result + [(goal, to_goal[node])]
+            return result
+
+        g = {start: 0}
+        trace: Dict[int, int] = {}
+        closed_list: Set[int] = set()
+        open_list = [(self.graph.distance_heuristic(start, goal), 0, start)]
+        while open_list != []:
+            _, g_node, node = heapq.heappop(open_list)
+            if node in closed_list:
+                continue
+            closed_list.add(node)
+            if stats is not None: stats.expansions += 1
+            if node == goal:
+                path = [node]
+                while node != start:
+                    node = trace[node]
+                    path.append(node)
+                return list(reversed(path))
+            for adj, cost in neighbours(node):
+                g_new = g_node + cost
+                if adj in closed_list or g_new >= g.get(adj, float("+inf")):
+                    continue
+                g[adj] = g_new
+                trace[adj] = node
+                heapq.heappush(open_list, (g_new + self.graph.distance_heuristic(adj, goal), g_new, adj))
+                if stats is not None: stats.pushes += 1
+        return None
+
+    def plan(self, start: int, goal: int, reservations: ReservationTable, start_time = 0,
+        horizon: int | None = None, stats: SearchStats | None = None) -> List[int] | None:
+        # Space-time path from start to goal around the reservations. The abstract path is
+        # refined SEGMENT_BORDERS cluster borders at a time, inside the clusters each part
+        # goes through. If the reservations
+        # get in the way, the whole path is searched at once within the clusters of the
+        # abstract path, and then once more with one cluster more in every direction.
+        if not (0 <= start < self.graph.size and 0 <= goal < self.graph.size):
+            if stats is not None: stats.add_path(None)
+            return None
+        abstract = self.abstract_path(start, goal, stats)
+        if abstract is None:
+            if stats is not None: stats.add_path(None)
+            return None
+        if len(abstract) == 1:
+            # already on the goal, but it still has to be safe to stay there
+            abstract = [start, goal]
+        # crossing a border takes two transition cells, one on either side
+        stops = list(range(0, len(abstract) - 1, 2 * SEGMENT_BORDERS)) + [len(abstract) - 1]
+        path = [start]
+        for i, j in zip(stops, stops[1:]):
+            u, v = abstract[i], abstract[j]
+            clusters = {self.cluster_of(n) for n in abstract[i:j+1]}
+            corridor = _Corridor(self, clusters)
+            t = start_time + len(path) - 1
+            limit = horizon
+            if limit is None:
+                limit = max(reservations.horizon, t) + len(clusters) * self.cluster_size ** 2
+            segment = a_star_space_time(corridor, u, v, reservations, limit, stats, t, park=v == goal)
+            if segment is None:
+                break
+            path += segment[1:]
+        else:
+            return path
+        
+        clusters = {self.cluster_of(n) for n in abstract}
+        for attempt in range(2):
+            if attempt > 0:
+                clusters = {n for c in clusters for n in self._around(c)}
+            corridor = _Corridor(self, clusters)
+            # no point in waiting longer than it takes to walk the whole corridor
+            limit = horizon
+            if limit is None:
+                limit = max(reservations.horizon, start_time) + len(clusters) * self.cluster_size ** 2
+            path = a_star_space_time(corridor, start, goal, reservations, limit, stats, start_time)
+            if path is not None:
+                return path
+        return None
+
+    def _around(self, cluster: int) -> List[int]:
+        cy, cx = divmod(cluster, self.clusters_x)
+        return [y * self.clusters_x + x
+            for y in range(max(0, cy - 1), min(self.clusters_y, cy + 2))
+            for x in range(max(0, cx - 1), min(self.clusters_x, cx + 2))]
+
+def hierarchy_of(graph: GridGraph, cluster_size = DEFAULT_CLUSTER_SIZE) -> Hierarchy:
+    # The graph's hierarchy with this cluster size, built and attached on first use
+    if graph.hierarchy is None or graph.hierarchy.cluster_size != cluster_size:
+        graph.hierarchy = Hierarchy(graph, cluster_size)
+    return graph.hierarchy
@@ -0,0 +1,41 @@
+import hashlib
+from typing import Dict, List, Tuple
+from agent import Agent
+from graph import GridGraph
+
+def read_lines(filename: str) -> List[str]:
+    grid : List[str] = []
+    with open(filename, 'r') as f:
+        for line in f:
+            grid.append(line.strip())
+    return grid
+
+def layout(grid: List[str]) -> List[str]:
+    # The map without its agents: anything that isn't a wall is walkable
+    return ["".join(c if c == GridGraph.WALL_CHAR else " " for c in row) for row in grid]
+
+def layout_key(grid: List[str]) -> str:
+    # Instances with the same key can share one graph (and its distance caches)
+    return hashlib.sha1("\n".join(layout(grid)).encode()).hexdigest()
+
+def parse_grid(grid: List[str], graph: GridGraph | None = None) -> Tuple[GridGraph, Dict[str, Agent]]:
+    if graph is None:
+        graph = GridGraph.from_grid(grid)
+        graph.freeze()
+    agents: Dict[str, Agent] = dict()
+    for y,row in enumerate(grid):
+        for x,c in enumerate(row):
+            if c in ["#", " "]: continue
+            c_low = c.lower()
+            c_upp = c.upper()
+            if c_low == c_upp: continue
+            if c_low not in agents:
+                agents[c_low] = Agent(c_low, -1, -1)
+            if c == c_low:
+                agents[c_low].init_pos = graph.id_from_coords(x,y)
+            else:
+                agents[c_low].goal = graph.id_from_coords(x,y)
+    return (graph, agents)
+
+def read_grid(filename: str) -> Tuple[GridGraph, Dict[str, Agent]]:
+    return parse_grid(read_lines(filename))
@@ -1,95 +1,478 @@
-from collections import defaultdict
-import heapq
-from typing import Dict, List, Set, Tuple
-from typing_extensions import override
-from graph import Graph
-
-def build_path(camefrom: List[int|None], origin:int, goal:int, reservations: Dict[int,Set[Tuple[int,int]]]):
-    curr = goal
-    revnodes = [goal]
-    while curr != origin and curr != None:
-        curr = camefrom[curr]
-        revnodes.append(curr)
-    if curr != origin: return None
-    
-    nodes = list(reversed(revnodes))
-    
-    t = 0
-    result = [origin]
-    for prev,pos in zip(nodes,nodes[1:]):
-        while (prev,pos) in reservations[t+1] or (pos,pos) in reservations[t+1]:
-            result.append(prev)
-            t += 1
-        result.append(pos)
-        t += 1
-    
-    return result
-
-def a_star_coop(graph: Graph, start: int, goal: int, 
-    reservations: Dict[int, Set[Tuple[int,int]]]) -> List[int] | None:
-    # cost map, preloaded with infinity
-    g = [float("+inf") for _ in range(graph.size)]
-    g[start] = 0
-    
-    # traceback to build path later
-    trace = [None for _ in range(graph.size)]
-    
-    open_list = [(graph.distance(start, goal), 0, start)]
-    closed_list: Set[int] = set()
-    
-    while open_list != []:
-        f_node, t, node = heapq.heappop(open_list)
-        if node in closed_list:
-            continue
-        if node == goal:
-            return build_path(trace, start, goal, reservations)
-        closed_list.add(node)
-        for adj,g_adj in graph.neighbours(node):
-            # that tile can't be used or has been explored
-            if adj in closed_list:
-                continue
-            # that tile can't be used if it's reserved totally or from our location
-            can_wait = True
-            wait_cost = 0
-            while (adj,adj) in reservations[t+1] or (node,adj) in reservations[t+1]:
-                # if we can't wait, stop this expansion
-                if (node, node) in reservations[t+1]:
-                    can_wait = False
-                    break
-                wait_cost += 1
-                t += 1 # attempt to wait
-            if not can_wait:
-                continue
-            g_new = g[node] + g_adj + wait_cost
-            # we already found a lower-cost path to the neighbour
-            if g_new >= g[adj]:
-                continue
-            
-            f = g_new + graph.distance_heuristic(adj,goal)
-            heapq.heappush(open_list, (f,t+1,adj))
-            
-            trace[adj] = node
-            g[adj] = g_new
-
-def multi_agent_pathfinding(graph: Graph, 
-    start: List[int], goal: List[int]) -> List[List[int] | None]:
-    result, reservations = multi_agent_pathfinding_with_reservations(graph, start, goal)
-    return result
-
-def multi_agent_pathfinding_with_reservations(graph: Graph, 
-    start: List[int], goal: List[int]) -> Tuple[List[List[int] | None], Dict[int, Set]]:
-    # Initialize the reservations table
-    reservations : Dict[int,Set] = defaultdict(set)
-    plans = []
-    for s,g in zip(start, goal):
-        plan = a_star_coop(graph, s, g, reservations)
-        plans.append(plan)
-        if not plan:
-            continue
-        for t in range(len(plan)):
-            reservations[t].add((plan[t],plan[t]))
-            if t > 0: # Reserve swaps
-                reservations[t].add((plan[t],plan[t-1]))
-        for t in range(len(plan),graph.size):
-            reservations[t].add((g,g))
-    return plans, reservations
\ No newline at end of file
+import heapq
+import random
+from typing import Callable, Dict, Generator, Iterable, List, Sequence, Set, Tuple
+from typing_extensions import override
+from graph import Graph
+from reservations import ReservationTable
+from stats import SearchStats
+
+def build_path(camefrom: List[int|None], origin:int, goal:int, reservations: ReservationTable, limit: int):
+    curr = goal
+    revnodes = [goal]
+    while curr != origin and curr != None:
+        curr = camefrom[curr]
+        revnodes.append(curr)
+    if curr != origin: return None
+    
+    nodes = list(reversed(revnodes))
+    
+    t = 0
+    result = [origin]
+    for prev,pos in zip(nodes,nodes[1:]):
+        while reservations.is_reserved(prev, pos, t+1):
+            # the node stays blocked for good (e.g. another agent is parked on it)
+            if t >= limit: return None
+            result.append(prev)
+            t += 1
+        result.append(pos)
+        t += 1
+    
+    return result
+
+def a_star_space_time(graph: Graph, start: int, goal: int,
+    reservations: ReservationTable, horizon: int | None = None,
+    stats: SearchStats | None = None, start_time = 0, park = True) -> List[int] | None:
+    # The returned path starts at start_time, the time step at which the agent is on start.
+    # Without park, goal is only a waypoint that may be reached at any time.
+    h_start = graph.distance_heuristic(start, goal)
+    # the goal may only be occupied for good once nobody else needs it
+    earliest_end = reservations.last_reserved(goal) + 1 if park else start_time
+    if h_start == float("+inf") or earliest_end == float("+inf"):
+        if stats is not None: stats.add_path(None)
+        return None
+    
+    size = graph.size
+    # Past the last reserved time step only parked agents are left, and they block the
+    # same nodes at every later step, so all those time steps are searched as one: a
+    # (node, t) state is encoded as min(t, settled) * size + node. This bounds the search
+    # by (settled - start_time + 1) copies of the graph even when the goal can't be
+    # reached, and the horizon (if any) only limits how late the path may end.
+    settled = max(reservations.horizon, start_time) + 1
+    # frozen graphs are read straight from their packed arrays
+    csr = getattr(graph, "csr", None)
+    if csr is not None:
+        offsets, targets, weights = csr
+    start_state = min(start_time, settled) * size + start
+    g = {start_state: 0}
+    trace: Dict[int, int] = {}
+    closed_list: Set[int] = set()
+    # ties on f are broken towards later time steps
+    open_list = [(max(h_start, earliest_end - start_time), -start_time, 0, start_state)]
+    
+    while open_list != []:
+        _, neg_t, g_state, state = heapq.heappop(open_list)
+        if state in closed_list:
+            continue
+        closed_list.add(state)
+        t = -neg_t
+        node = state % size
+        if stats is not None: stats.expansions += 1
+        if node == goal and t >= earliest_end:
+            path = [node]
+            while state != start_state:
+                state = trace[state]
+                path.append(state % size)
+            path.reverse()
+            if stats is not None: stats.add_path(path)
+            return path
+        if horizon is not None and t >= horizon:
+            continue
+        
+        if csr is not None:
+            lo, hi = offsets[node], offsets[node+1]
+        else:
+            neighbours = graph.neighbours(node)
+            lo, hi = 0, len(neighbours)
+        if stats is not None: stats.probes += hi - lo + 1
+        next_layer = min(t + 1, settled) * size
+        for i in range(lo, hi + 1):
+            if i == hi:
+                # waiting in place is an explicit action with unit cost
+                adj, g_adj = node, 1.0
+            elif csr is not None:
+                adj, g_adj = targets[i], weights[i]
+            else:
+                adj, g_adj = neighbours[i]
+            if reservations.is_reserved(node, adj, t+1):
+                continue
+            adj_state = next_layer + adj
+            if adj_state in closed_list:
+                continue
+            g_new = g_state + g_adj
+            if g_new >= g.get(adj_state, float("+inf")):
+                continue
+            g[adj_state] = g_new
+            trace[adj_state] = state
+            # the path can't end before earliest_end, and every step (waits included) costs
+            # at least one, so that many steps are still to come even next to the goal
+            h = max(graph.distance_heuristic(adj, goal), earliest_end - (t+1))
+            heapq.heappush(open_list, (g_new + h, -(t+1), g_new, adj_state))
+            if stats is not None: stats.pushes += 1
+    if stats is not None: stats.add_path(None)
+    return None
+
+def a_star_coop(graph: Graph, start: int, goal: int, 
+    reservations: ReservationTable,
+    space_time = False, horizon: int | None = None,
+    stats: SearchStats | None = None) -> List[int] | None:
+    if space_time:
+        return a_star_space_time(graph, start, goal, reservations, horizon, stats)
+    
+    # cost map, preloaded with infinity
+    g = [float("+inf") for _ in range(graph.size)]
+    g[start] = 0
+    
+    # traceback to build path later
+    trace = [None for _ in range(graph.size)]
+    
+    h_start = graph.distance_heuristic(start, goal)
+    if h_start == float("+inf"):
+        # not reachable even if there were no reservations
+        if stats is not None: stats.add_path(None)
+        return None
+    open_list = [(h_start, 0, start)]
+    closed_list: Set[int] = set()
+    # past this point every reservation left is permanent, so waiting is pointless
+    limit = reservations.horizon + graph.size
+    # frozen graphs are read straight from their packed arrays
+    csr = getattr(graph, "csr", None)
+    if csr is not None:
+        offsets, targets, weights = csr
+    
+    while open_list != []:
+        f_node, t, node = heapq.heappop(open_list)
+        if node in closed_list:
+            continue
+        if node == goal:
+            path = build_path(trace, start, goal, reservations, limit)
+            if stats is not None: stats.add_path(path)
+            return path
+        closed_list.add(node)
+        if stats is not None: stats.expansions += 1
+        if csr is not None:
+            lo, hi = offsets[node], offsets[node+1]
+        else:
+            neighbours = graph.neighbours(node)
+            lo, hi = 0, len(neighbours)
+        for i in range(lo, hi):
+            adj, g_adj = (targets[i], weights[i]) if csr is not None else neighbours[i]
+            # that tile can't be used or has been explored
+            if adj in closed_list:
+                continue
+            # that tile can't be used if it's reserved totally or from our location
+            can_wait = True
+            wait_cost = 0
+            if stats is not None: stats.probes += 1
+            while reservations.is_reserved(node, adj, t+1):
+                if stats is not None: stats.probes += 2
+                # if we can't wait, stop this expansion
+                if t >= limit or reservations.is_vertex_reserved(node, t+1):
+                    can_wait = False
+                    break
+                wait_cost += 1
+                t += 1 # attempt to wait
+            if not can_wait:
+                continue
+            g_new = g[node] + g_adj + wait_cost
+            # we already found a lower-cost path to the neighbour
+            if g_new >= g[adj]:
+                continue
+            
+            f = g_new + graph.distance_heuristic(adj,goal)
+            heapq.heappush(open_list, (f,t+1,adj))
+            if stats is not None: stats.pushes += 1
+            
+            trace[adj] = node
+            g[adj] = g_new
+    if stats is not None: stats.add_path(None)
+
+# Windowed planning ends once the agents have gone this many time steps without getting
+# any closer to their goals
+STALLED_STEPS = 256
+# Largest window the agents look ahead when they keep coming back to the same positions
+MAX_WINDOW = 32
+
+def _a_star_window(graph: Graph, start: int, goal: int, reservations: ReservationTable, window: int,
+    h: Sequence[float], stats: SearchStats | None = None) -> List[int] | None:
+    # The window steps of a WHCA* search: space-time A* that only looks window steps ahead
+    # and counts the exact distance h to the goal from wherever that leaves the agent.
+    # Waiting on the goal is free, so an agent that gets there stays unless it's in the
+    # way. Returns window + 1 positions, or None if every trajectory runs into a
+    # reservation before the window ends.
+    size = graph.size
+    csr = getattr(graph, "csr", None)
+    if csr is not None:
+        offsets, targets, weights = csr
+    g = {start: 0.0}
+    trace: Dict[int, int] = {}
+    closed_list: Set[int] = set()
+    # ties on f are broken towards later time steps
+    open_list = [(h[start], 0, 0.0, start)]
+    while open_list != []:
+        _, neg_t, g_state, state = heapq.heappop(open_list)
+        if state in closed_list:
+            continue
+        closed_list.add(state)
+        t = -neg_t
+        node = state % size
+        if stats is not None: stats.expansions += 1
+        if t == window:
+            path = [node]
+            while state != start:
+                state = trace[state]
+                path.append(state % size)
+            path.reverse()
+            if stats is not None: stats.add_path(path)
+            return path
+        
+        if csr is not None:
+            lo, hi = offsets[node], offsets[node+1]
+        else:
+            neighbours = graph.neighbours(node)
+            lo, hi = 0, len(neighbours)
+        if stats is not None: stats.probes += hi - lo + 1
+        for i in range(lo, hi + 1):
+            if i == hi:
+                adj, g_adj = node, 0.0 if node == goal else 1.0
+            elif csr is not None:
+                adj, g_adj = targets[i], weights[i]
+            else:
+                adj, g_adj = neighbours[i]
+            if reservations.is_reserved(node, adj, t+1):
+                continue
+            adj_state = (t+1) * size + adj
+            if adj_state in closed_list:
+                continue
+            g_new = g_state + g_adj
+            if g_new >= g.get(adj_state, float("+inf")):
+                continue
+            g[adj_state] = g_new
+            trace[adj_state] = state
+            heapq.heappush(open_list, (g_new + h[adj], -(t+1), g_new, adj_state))
+            if stats is not None: stats.pushes += 1
+    if stats is not None: stats.add_path(None)
+    return None
+
+def _plan_window(graph: Graph, positions: List[int], goal: List[int],
+    order: List[int], window: int, stats: SearchStats | None = None, round = 0) -> List[List[int]] | int:
+    # Plans one round in the given priority order. Returns the segments, or the index of
+    # an agent that had nowhere to go once the agents before it were committed.
+    reservations = ReservationTable()
+    # nobody may step into a cell that is still occupied by an agent planned later
+    for i in order:
+        reservations.reserve_vertex(positions[i], 1)
+    # agents left out of the order stay where they are
+    segments: List[List[int]] = [[p] for p in positions]
+    for i in order:
+        reservations.release_vertex(positions[i], 1)
+        if stats is not None: stats.begin_agent(i, round=round)
+        segment = _a_star_window(graph, positions[i], goal[i], reservations, window, graph.distances_to(goal[i]), stats)
+        if stats is not None: stats.end_agent(i, segment)
+        if segment is None:
+            return i
+        # only the committed steps are reserved, the rest is replanned next round
+        reservations.reserve_path(segment, park=False)
+        segments[i] = segment
+    return segments
+
+def windowed_multi_agent_pathfinding(graph: Graph,
+    start: List[int], goal: List[int], window = 8,
+    max_rounds: int | None = None, stats: SearchStats | None = None) -> Generator[List[List[int]], None, None]:
+    # Windowed cooperative A* (WHCA*): every round each agent searches only the next
+    # `window` steps around the agents planned before it, guided by its exact distance to
+    # the goal beyond them, and commits to those steps. Each round yields one segment per
+    # agent, starting where the previous one ended, all of the same length: window + 1
+    # positions as long as the agents get closer to their goals. When they come back to
+    # positions they were in before, the priorities are shuffled and the window doubles
+    # (up to MAX_WINDOW) so they can see their way around each other, until they make
+    # progress again. Ends once every agent is on its goal, or after STALLED_STEPS time
+    # steps without getting any closer.
+    positions = list(start)
+    # agents without a valid start or goal on the map take no part in the planning
+    active = [i for i,(s,g) in enumerate(zip(start, goal)) if 0 <= s < graph.size and 0 <= g < graph.size]
+    n = len(active)
+    tables = {i: graph.distances_to(goal[i]) for i in active}
+    def remaining() -> float:
+        return sum(min(tables[i][positions[i]], graph.size) for i in active)
+    best = remaining()
+    stalled = 0
+    rounds = 0
+    lookahead = window
+    rng = random.Random(0)
+    # positions at the start of every round since the last progress
+    seen: Set[Tuple[int, ...]] = set()
+    order = list(active)
+    while any(positions[i] != goal[i] for i in active) and stalled < STALLED_STEPS:
+        if max_rounds is not None and rounds >= max_rounds:
+            return
+        if tuple(positions) in seen:
+            lookahead = min(2 * lookahead, max(window, MAX_WINDOW))
+            rng.shuffle(order)
+        else:
+            # rotate priorities every round so no agent is always planned last
+            order = order[1:] + order[:1]
+        seen.add(tuple(positions))
+        segments = _plan_window(graph, positions, goal, order, lookahead, stats, rounds)
+        for _ in range(n):
+            if not isinstance(segments, int):
+                break
+            # give the agent that got boxed in the first pick and try again
+            order.remove(segments)
+            order.insert(0, segments)
+            segments = _plan_window(graph, positions, goal, order, lookahead, stats, rounds)
+        if isinstance(segments, int):
+            # a single step always works: every agent can at least stay where it is
+            segments = _plan_window(graph, positions, goal, order, 1, stats, rounds)
+        
+        positions = [segment[-1] for segment in segments]
+        progress = remaining()
+        if progress < best:
+            best, stalled, lookahead = progress, 0, window
+            seen.clear()
+        else:
+            stalled += max(len(segment) for segment in segments) - 1
+        rounds += 1
+        yield segments
+
+def _collect_windowed(graph: Graph, start: List[int], goal: List[int], window: int,
+    stats: SearchStats | None = None) -> List[List[int] | None]:
+    plans = [[s] for s in start]
+    max_rounds = max(1, 2 * graph.size // window)
+    for segments in windowed_multi_agent_pathfinding(graph, start, goal, window, max_rounds, stats):
+        for plan, segment in zip(plans, segments):
+            plan.extend(segment[1:])
+    result = []
+    for plan, g in zip(plans, goal):
+        if plan[-1] != g:
+            result.append(None)
+            continue
+        # drop the trailing waits on the goal
+        while len(plan) > 1 and plan[-2] == g:
+            plan.pop()
+        result.append(plan)
+    return result
+
+SOLVERS = ["prioritized", "orderings", "hierarchical", "cbs", "ecbs"]
+# solvers that take a time_limit and return the best plans found by then
+ANYTIME_SOLVERS = ["orderings", "cbs", "ecbs"]
+# suboptimality factor used by the "ecbs" solver unless one is given
+ECBS_SUBOPTIMALITY = 1.5
+
+def multi_agent_pathfinding(graph: Graph, 
+    start: List[int], goal: List[int],
+    space_time = False, horizon: int | None = None,
+    window: int | None = None, solver = "prioritized", stats: SearchStats | None = None,
+    **solver_options) -> List[List[int] | None]:
+    result, reservations = multi_agent_pathfinding_with_reservations(graph, start, goal, space_time, horizon, window,
+        solver, stats, **solver_options)
+    return result
+
+def multi_agent_pathfinding_with_reservations(graph: Graph, 
+    start: List[int], goal: List[int],
+    space_time = False, horizon: int | None = None,
+    window: int | None = None, solver = "prioritized", stats: SearchStats | None = None,
+    **solver_options) -> Tuple[List[List[int] | None], ReservationTable]:
+    if solver not in SOLVERS:
+        raise ValueError(f"Unknown solver {solver!r}, expected one of {SOLVERS}")
+    # Initialize the reservations table
+    reservations = ReservationTable()
+    if solver == "orderings":
+        # imported here as the ordering search builds on the planners in this module
+        from orderings import search_orderings
+        plans, order = search_orderings(graph, start, goal, horizon, stats=stats, **solver_options)
+        for plan in plans:
+            if plan:
+                reservations.reserve_path(plan)
+        return plans, reservations
+    if solver == "hierarchical":
+        # imported here as hpa builds on the planners in this module
+        from hpa import hierarchy_of
+        hierarchy = hierarchy_of(graph, **solver_options)
+        def low_level(s: int, g: int, reservations: ReservationTable, stats: SearchStats | None) -> List[int] | None:
+            return hierarchy.plan(s, g, reservations, horizon=horizon, stats=stats)
+        plans = plan_in_order(graph, start, goal, range(len(start)), reservations, stats=stats, low_level=low_level)
+        return plans, reservations
+    if solver != "prioritized":
+        # imported here as cbs builds on the planners in this module
+        from cbs import cbs
+        if solver == "ecbs":
+            solver_options.setdefault("suboptimality", ECBS_SUBOPTIMALITY)
+        plans = cbs(graph, start, goal, stats=stats, **solver_options)
+        for plan in plans:
+            if plan:
+                reservations.reserve_path(plan)
+        return plans, reservations
+    if window is not None:
+        plans = _collect_windowed(graph, start, goal, window, stats)
+        for plan in plans:
+            if plan:
+                reservations.reserve_path(plan)
+        return plans, reservations
+    
+    plans = plan_in_order(graph, start, goal, range(len(start)), reservations, space_time, horizon, stats)
+    return plans, reservations
+
+def plan_in_order(graph: Graph, start: List[int], goal: List[int], order: Iterable[int],
+    reservations: ReservationTable, space_time = False, horizon: int | None = None,
+    stats: SearchStats | None = None,
+    low_level: Callable[[int, int, ReservationTable, SearchStats | None], List[int] | None] | None = None) -> List[List[int] | None]:
+    # Prioritized planning: every agent in order plans around the ones before it, with
+    # a_star_coop unless another low_level search is given. The plans are returned by
+    # agent index.
+    plans: List[List[int] | None] = [None for _ in start]
+    for i in order:
+        if stats is not None: stats.begin_agent(i)
+        if low_level is None:
+            plan = a_star_coop(graph, start[i], goal[i], reservations, space_time, horizon, stats)
+        else:
+            plan = low_level(start[i], goal[i], reservations, stats)
+        if stats is not None: stats.end_agent(i, plan)
+        plans[i] = plan
+        if not plan:
+            continue
+        # Reserve the path and its swaps, then keep the goal held once reached
+        reservations.reserve_path(plan)
+    return plans
+
+def repair_multi_agent_paths(graph: Graph,
+    start: List[int], goal: List[int], plans: List[List[int] | None],
+    changed: Iterable[int], t = 0, horizon: int | None = None, retry_failed = False,
+    stats: SearchStats | None = None) -> Tuple[List[List[int] | None], ReservationTable]:
+    # Repairs space-time plans after the nodes in changed were blocked or unblocked at time
+    # step t (see GridGraph.block_cell). Only the agents whose plans visit a changed node
+    # from t on (and, with retry_failed, the ones without a plan) are planned again from
+    # where they are at t, in their original order and around everybody else's plans.
+    changed = set(changed)
+    plans = list(plans)
+    # where each agent is up to and including t; agents without a plan take no part in
+    # the others' plans, a retried one joins at its start at t
+    def history(i: int) -> List[int]:
+        plan = plans[i] or [start[i]]
+        return (plan + [plan[-1]] * t)[:t+1]
+    
+    active = [i for i,(s,g) in enumerate(zip(start, goal)) if 0 <= s < graph.size and 0 <= g < graph.size]
+    affected = [i for i in active if (retry_failed if plans[i] is None else
+        any(n in changed for n in plans[i][min(t, len(plans[i]) - 1):]))]
+    reservations = ReservationTable()
+    kept = set(active) - set(affected)
+    for i, plan in enumerate(plans):
+        if plan and i in kept:
+            reservations.reserve_path(plan)
+    # nobody may step into the cell of an agent that hasn't been repaired yet
+    for i in affected:
+        reservations.reserve_vertex(history(i)[-1], t+1)
+    
+    for i in affected:
+        before = history(i)
+        reservations.release_vertex(before[-1], t+1)
+        if stats is not None: stats.begin_agent(i, repair=t)
+        path = a_star_space_time(graph, before[-1], goal[i], reservations, horizon, stats, start_time=t)
+        if stats is not None: stats.end_agent(i, path)
+        if path is None:
+            # the agent stops where it is, so the others still have to go around it
+            plans[i] = None
+            reservations.reserve_path(before)
+            continue
+        plans[i] = before[:-1] + path
+        reservations.reserve_path(plans[i])
+    return plans, reservations
@@ -0,0 +1,160 @@
+import os
+import random
+import signal
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Deque, Dict, List, Set, Tuple
+
+from graph import Graph
+from mapf import plan_in_order
+from reservations import ReservationTable
+from stats import SearchStats
+
+# Orderings tried unless another count is given
+DEFAULT_ORDERINGS = 32
+
+# The instance every worker process plans, set once per worker by _init_worker
+_instance: Dict = {}
+
+class OrderingTimeout(Exception):
+    pass
+
+def _raise_timeout(signum, frame):
+    raise OrderingTimeout()
+
+def _init_worker(graph: Graph, start: List[int], goal: List[int], horizon: int | None, stats: SearchStats | None):
+    # stats is an empty copy of the caller's, so the workers' timings share its origin
+    _instance.update(graph=graph, start=start, goal=goal, horizon=horizon, stats=stats)
+
+def _plan_ordering(order: List[int], deadline: float | None) -> Tuple[List[List[int] | None], SearchStats | None] | None:
+    # Runs in a worker, returns the plans and what the searches for them counted (if the
+    # caller collects stats), or None if the deadline passes first
+    use_alarm = deadline is not None and hasattr(signal, "SIGALRM")
+    if use_alarm:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        previous = signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, remaining)
+    stats = None if _instance["stats"] is None else _instance["stats"].empty_copy()
+    try:
+        # always in space-time: the node-based search lets plans conflict, and conflicting
+        # plans can't be compared by their cost
+        plans = plan_in_order(_instance["graph"], _instance["start"], _instance["goal"], order,
+            ReservationTable(), True, _instance["horizon"], stats)
+        return plans, stats
+    except OrderingTimeout:
+        return None
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+
+def _score(plans: List[List[int] | None]) -> Tuple[int, float]:
+    # lower is better: most agents solved first, then the lowest sum of costs
+    solved = [p for p in plans if p]
+    return (-len(solved), sum(len(p) - 1 for p in solved))
+
+def _reorder(order: List[int], plans: List[List[int] | None], h: List[float], active: Set[int]) -> List[int] | None:
+    # Conflict-driven reordering: the agents that failed go first. If nobody failed, the
+    # agent delayed the most by the ones planned before it goes first instead.
+    first = [i for i in order if i in active and not plans[i]]
+    if first == []:
+        worst = max(active, key=lambda i: len(plans[i]) - 1 - h[i], default=None)
+        if worst is None or len(plans[worst]) - 1 <= h[worst]:
+            return None
+        first = [worst]
+    return first + [i for i in order if i not in first]
+
+def search_orderings(graph: Graph, start: List[int], goal: List[int],
+    horizon: int | None = None, workers: int | None = None,
+    time_limit: float | None = None, max_orderings: int | None = None, seed = 0,
+    stats: SearchStats | None = None) -> Tuple[List[List[int] | None], List[int]]:
+    # Prioritized planning with space-time A* under many priority orderings at once, one
+    # per worker process. Starts with the given order, farthest goal first and nearest
+    # goal first, then goes on with conflict-driven reorderings of the best result so far
+    # and random restarts. Returns the best plans (most agents solved, then lowest sum of
+    # costs) and their order, after max_orderings orderings (DEFAULT_ORDERINGS unless
+    # given), time_limit seconds, or as soon as every agent has a path as short as its
+    # heuristic.
+    n = len(start)
+    workers = workers or os.cpu_count() or 1
+    # every ordering counts into an empty copy of stats, merged back once it's planned
+    template = None if stats is None else stats.empty_copy()
+    if max_orderings is None:
+        max_orderings = DEFAULT_ORDERINGS
+    deadline = None if time_limit is None else time.monotonic() + time_limit
+    active = [i for i,(s,g) in enumerate(zip(start, goal)) if 0 <= s < graph.size and 0 <= g < graph.size]
+    inactive = [i for i in range(n) if i not in set(active)]
+    # computed before the pool starts, so forked workers inherit the heuristic caches
+    h = [0.0 for _ in range(n)]
+    for i in active:
+        h[i] = graph.distance_heuristic(start[i], goal[i])
+    lower_bound = (-len(active), sum(h[i] for i in active))
+
+    rng = random.Random(seed)
+    pending: Deque[List[int]] = deque([
+        list(range(n)),
+        sorted(active, key=lambda i: -h[i]) + inactive,
+        sorted(active, key=lambda i: h[i]) + inactive,
+    ])
+    tried: Set[Tuple[int, ...]] = set()
+    def next_order() -> List[int] | None:
+        while pending:
+            order = pending.popleft()
+            if tuple(order) not in tried:
+                return order
+        # give up on random restarts once they keep repeating (few agents)
+        for _ in range(100):
+            order = list(active)
+            rng.shuffle(order)
+            order += inactive
+            if tuple(order) not in tried:
+                return order
+        return None
+
+    best_plans: List[List[int] | None] = [None for _ in start]
+    best_order = list(range(n))
+    best_score = None
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+        initargs=(graph, start, goal, horizon, template)) as pool:
+        # future -> (how many orderings were submitted before it, order)
+        running: Dict[Future, Tuple[int, List[int]]] = {}
+        submitted = 0
+        while True:
+            while len(running) < workers and submitted < max_orderings \
+                and (deadline is None or time.monotonic() < deadline):
+                order = next_order()
+                if order is None:
+                    break
+                tried.add(tuple(order))
+                running[pool.submit(_plan_ordering, order, deadline)] = (submitted, order)
+                submitted += 1
+            if not running:
+                break
+            timeout = None if deadline is None else max(0, deadline - time.monotonic())
+            done, _ = wait(running, timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                # out of time, the running orderings stop at the deadline on their own
+                break
+            for future in done:
+                number, order = running.pop(future)
+                result = future.result()
+                if result is None:
+                    continue
+                plans, ordering_stats = result
+                score = _score(plans)
+                if stats is not None:
+                    stats.merge(ordering_stats, ordering=number)
+                    stats.event("ordering", solved=-score[0], cost=score[1])
+                if best_score is None or score < best_score:
+                    best_plans, best_order, best_score = plans, order, score
+                    reordered = _reorder(order, plans, h, set(active))
+                    if reordered is not None:
+                        pending.appendleft(reordered)
+            if best_score == lower_bound:
+                break
+        for future in running:
+            future.cancel()
+    return best_plans, best_order
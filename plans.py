@@ -0,0 +1,263 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Iterator, List, Sequence, Tuple
+
+from agent import Agent
+from distances import map_hash
+from graph import GridGraph
+
+MAGIC = b"MAPFPLN1"
+# magic, map hash, grid width, grid height, agent count, index offset; padded to HEADER_SIZE
+HEADER = struct.Struct("<8s20s4xQQQQ")
+HEADER_SIZE = 64
+# per agent: start, end, goal, steps (-1 without a plan), data offset and length,
+# checkpoints offset and count, name offset and length
+RECORD = struct.Struct("<qqqqQQQQQQ")
+# Moves are stored as one byte per run of equal moves: the move code in the top three
+# bits and the run length - 1 in the low five
+WAIT, UP, DOWN, LEFT, RIGHT = range(5)
+MAX_RUN = 32
+# every this many steps, a plan stores where decoding can pick up (see CompactPath)
+CHECKPOINT_STEPS = 256
+
+def _deltas(dim_x: int) -> List[int]:
+    return [0, -dim_x, dim_x, -1, 1]
+
+def encode_path(path: Sequence[int], dim_x: int) -> Tuple[bytes, array]:
+    # Returns the run-length encoded moves of path and its checkpoints, flattened
+    # (byte index, moves of that run already done, node) triples
+    codes = {d: code for code, d in enumerate(_deltas(dim_x))}
+    data = bytearray()
+    checkpoints = array("q")
+    step = 0
+    i = 0
+    while i < len(path) - 1:
+        delta = path[i+1] - path[i]
+        if delta not in codes:
+            raise ValueError(f"{path[i]} -> {path[i+1]} is not a grid move")
+        run = 1
+        while run < MAX_RUN and i + run < len(path) - 1 and path[i+run+1] - path[i+run] == delta:
+            run += 1
+        # the checkpoints falling inside this run point into it
+        for s in range((step + CHECKPOINT_STEPS - 1) // CHECKPOINT_STEPS * CHECKPOINT_STEPS or CHECKPOINT_STEPS,
+            step + run, CHECKPOINT_STEPS):
+            checkpoints.extend((len(data), s - step, path[i + s - step]))
+        data.append(codes[delta] << 5 | (run - 1))
+        step += run
+        i += run
+    return bytes(data), checkpoints
+
+class CompactPath:
+    # A path kept as its encoded moves and decoded on access. It supports len, indexing
+    # (also negative), slicing and iteration like the list it stands for, so it can be
+    # used as Agent.positions. Reading positions in increasing order continues from the
+    # last one read instead of decoding from the nearest checkpoint.
+    def __init__(self, data: Sequence[int], start: int, end: int, steps: int, checkpoints: Sequence[int], dim_x: int):
+        self._data = data
+        self._start = start
+        self._end = end
+        self._steps = steps
+        self._checkpoints = checkpoints
+        self._deltas = _deltas(dim_x)
+        # (step, byte index, moves of that run already done, node) of the last position read
+        self._cursor = (0, 0, 0, start)
+
+    @classmethod
+    def from_path(cls, path: Sequence[int], dim_x: int) -> "CompactPath":
+        data, checkpoints = encode_path(path, dim_x)
+        return cls(data, path[0], path[-1], len(path) - 1, checkpoints, dim_x)
+
+    def __len__(self) -> int:
+        return self._steps + 1
+
+    def _position(self, t: int) -> int:
+        if t >= self._steps:
+            return self._end
+        step, i, done, node = self._cursor
+        k = t // CHECKPOINT_STEPS
+        if not step <= t or k * CHECKPOINT_STEPS > step:
+            if k == 0:
+                step, i, done, node = 0, 0, 0, self._start
+            else:
+                i, done, node = self._checkpoints[3*k-3:3*k]
+                step = k * CHECKPOINT_STEPS
+        data = self._data
+        while True:
+            run = data[i]
+            left = (run & 31) + 1 - done
+            delta = self._deltas[run >> 5]
+            if t - step < left:
+                node += (t - step) * delta
+                done += t - step
+                step = t
+                break
+            node += left * delta
+            step += left
+            i += 1
+            done = 0
+        self._cursor = (step, i, done, node)
+        return node
+
+    def __getitem__(self, t):
+        if isinstance(t, slice):
+            return [self._position(i) for i in range(*t.indices(len(self)))]
+        if t < 0:
+            t += len(self)
+        if not 0 <= t < len(self):
+            raise IndexError("path index out of range")
+        return self._position(t)
+
+    def __iter__(self) -> Iterator[int]:
+        node = self._start
+        yield node
+        for run in self._data:
+            delta = self._deltas[run >> 5]
+            for _ in range((run & 31) + 1):
+                node += delta
+                yield node
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, (list, tuple, CompactPath)):
+            return NotImplemented
+        return len(self) == len(other) and list(self) == list(other)
+
+    def nbytes(self) -> int:
+        return len(self._data) + 8 * len(self._checkpoints)
+
+def save_plans(filename: str, graph: GridGraph, names: List[str], starts: List[int], goals: List[int],
+    paths: List[Sequence[int] | None]):
+    # Writes the plans of one instance; a path of None (or [-1]) means the agent has no plan
+    streams = []
+    for path in paths:
+        if path is None or len(path) == 0 or path[0] < 0:
+            streams.append(None)
+        else:
+            streams.append((encode_path(path, graph.dim_x), path[0], path[-1], len(path) - 1))
+    tmp = f"{filename}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(b"\0" * HEADER_SIZE)
+        offsets = []
+        for stream in streams:
+            offsets.append(f.tell())
+            if stream is not None:
+                f.write(stream[0][0])
+        checkpoint_offsets = []
+        for stream in streams:
+            checkpoint_offsets.append(f.tell())
+            if stream is not None:
+                f.write(stream[0][1].tobytes())
+        name_offsets = []
+        encoded_names = [name.encode() for name in names]
+        for name in encoded_names:
+            name_offsets.append(f.tell())
+            f.write(name)
+        # records start 8-byte aligned
+        f.write(b"\0" * (-f.tell() % 8))
+        index_offset = f.tell()
+        for i, stream in enumerate(streams):
+            if stream is None:
+                f.write(RECORD.pack(starts[i], -1, goals[i], -1, offsets[i], 0, checkpoint_offsets[i], 0, name_offsets[i], len(encoded_names[i])))
+            else:
+                (data, checkpoints), start, end, steps = stream
+                f.write(RECORD.pack(start, end, goals[i], steps, offsets[i], len(data), checkpoint_offsets[i], len(checkpoints) // 3,
+                    name_offsets[i], len(encoded_names[i])))
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, bytes.fromhex(map_hash(graph)), graph.dim_x, graph.dim_y, len(streams), index_offset))
+    os.replace(tmp, filename)
+
+def save_agents(filename: str, graph: GridGraph, agents: List[Agent]):
+    # Saves the cooperative plans of agents, failed ones ([-1]) included as having no plan
+    save_plans(filename, graph, [a.name for a in agents], [a.init_pos for a in agents],
+        [a.goal for a in agents], [a.coop_path for a in agents])
+
+class PlanFile:
+    # A saved plan file, memory-mapped: only the index records and moves of the agents
+    # that are read ever leave the disk
+    def __init__(self, filename: str):
+        with open(filename, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, key, self.dim_x, self.dim_y, self.agents, self._index = HEADER.unpack_from(self._mm)
+        if magic != MAGIC:
+            raise ValueError(f"{filename} is not a plan file")
+        self.map_key = key.hex()
+        self._view = memoryview(self._mm)
+
+    def __len__(self) -> int:
+        return self.agents
+
+    def _record(self, i: int) -> Tuple[int, ...]:
+        if not 0 <= i < self.agents:
+            raise IndexError("agent index out of range")
+        return RECORD.unpack_from(self._mm, self._index + i * RECORD.size)
+
+    def name(self, i: int) -> str:
+        record = self._record(i)
+        return bytes(self._view[record[8]:record[8] + record[9]]).decode()
+
+    def names(self) -> List[str]:
+        return [self.name(i) for i in range(self.agents)]
+
+    def start(self, i: int) -> int:
+        return self._record(i)[0]
+
+    def goal(self, i: int) -> int:
+        return self._record(i)[2]
+
+    def path(self, i: int) -> CompactPath | None:
+        start, end, goal, steps, offset, length, checkpoints, count, _, _ = self._record(i)
+        if steps < 0:
+            return None
+        return CompactPath(self._view[offset:offset + length], start, end, steps,
+            self._view[checkpoints:checkpoints + 24 * count].cast("q"), self.dim_x)
+
+    def positions_at(self, t: int) -> List[int | None]:
+        # Where every agent is at time step t, None for agents without a plan
+        result = []
+        for i in range(self.agents):
+            path = self.path(i)
+            result.append(None if path is None else path[min(t, len(path) - 1)])
+        return result
+
+def load_agents(filename: str, graph: GridGraph, agents: List[Agent]) -> PlanFile:
+    # Sets the coop_path of every agent to its saved plan, by name, decoded only as it's read
+    plans = PlanFile(filename)
+    if plans.map_key != map_hash(graph):
+        raise ValueError(f"{filename} holds plans for a different map")
+    index = {name: i for i, name in enumerate(plans.names())}
+    for a in agents:
+        if a.name not in index:
+            raise ValueError(f"{filename} has no plan for agent {a.name}")
+        path = plans.path(index[a.name])
+        a.coop_path = [-1] if path is None else path
+    return plans
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Read a saved plan file")
+    parser.add_argument("file")
+    parser.add_argument("-a", "--agent", default=None, dest="agent",
+        help="print the path of this agent (by name)")
+    parser.add_argument("-t", "--time", type=int, default=None, dest="time",
+        help="print the position of every agent at this time step")
+    args = parser.parse_args()
+
+    plans = PlanFile(args.file)
+    names = plans.names()
+    def coords(node: int | None):
+        return None if node is None else [node % plans.dim_x, node // plans.dim_x]
+    if args.agent is not None:
+        path = plans.path(names.index(args.agent))
+        json.dump(None if path is None else [coords(n) for n in path], sys.stdout)
+        print()
+    elif args.time is not None:
+        json.dump({name: coords(node) for name, node in zip(names, plans.positions_at(args.time))}, sys.stdout)
+        print()
+    else:
+        solved = [plans.path(i) for i in range(len(plans))]
+        solved = [p for p in solved if p is not None]
+        print(f"{len(plans)} agents on a {plans.dim_x}x{plans.dim_y} map ({plans.map_key}), {len(solved)} with a plan, "
+            f"makespan {max((len(p) - 1 for p in solved), default=0)}, {sum(p.nbytes() for p in solved)} bytes of moves")
@@ -0,0 +1,134 @@
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Set, Tuple
+
+class ReservationTable:
+    def __init__(self):
+        # Per node, disjoint half-open [start, end) intervals of reserved time steps,
+        # kept sorted as two parallel lists so they can be bisected
+        self._starts: Dict[int, List[int]] = {}
+        self._ends: Dict[int, List[int]] = {}
+        # Nodes held forever from the given time step (agents parked on their goal)
+        self._parked: Dict[int, int] = {}
+        # (t, origin, destination): moving origin -> destination and arriving at t
+        # would swap places with another agent
+        self._edges: Set[Tuple[int,int,int]] = set()
+        # Last time step holding a finite reservation
+        self.horizon = 0
+
+    def reserve_vertex(self, node: int, start: int, end: int | None = None):
+        if end is None:
+            end = start + 1
+        starts = self._starts.setdefault(node, [])
+        ends = self._ends.setdefault(node, [])
+        # merge with every interval that overlaps or touches [start, end)
+        lo = bisect_left(ends, start)
+        hi = bisect_right(starts, end)
+        if lo < hi:
+            start = min(start, starts[lo])
+            end = max(end, ends[hi-1])
+        starts[lo:hi] = [start]
+        ends[lo:hi] = [end]
+        self.horizon = max(self.horizon, end - 1)
+
+    def release_vertex(self, node: int, start: int, end: int | None = None):
+        if end is None:
+            end = start + 1
+        starts = self._starts.get(node)
+        if not starts:
+            return
+        ends = self._ends[node]
+        lo = bisect_right(ends, start)
+        hi = bisect_left(starts, end)
+        if lo >= hi:
+            return
+        # keep whatever sticks out on either side of [start, end)
+        kept_starts, kept_ends = [], []
+        if starts[lo] < start:
+            kept_starts.append(starts[lo])
+            kept_ends.append(start)
+        if ends[hi-1] > end:
+            kept_starts.append(end)
+            kept_ends.append(ends[hi-1])
+        starts[lo:hi] = kept_starts
+        ends[lo:hi] = kept_ends
+        if not starts:
+            del self._starts[node]
+            del self._ends[node]
+
+    def park(self, node: int, t: int):
+        self._parked[node] = min(t, self._parked.get(node, t))
+        self.horizon = max(self.horizon, t)
+
+    def reserve_edge(self, origin: int, destination: int, t: int):
+        # an agent moving origin -> destination at t forbids destination -> origin at t
+        self._edges.add((t, destination, origin))
+        self.horizon = max(self.horizon, t)
+
+    def reserve_path(self, path: List[int], start_time = 0, park = True):
+        for t, pos in enumerate(path, start_time):
+            self.reserve_vertex(pos, t)
+            if t > start_time and path[t-start_time-1] != pos:
+                self.reserve_edge(path[t-start_time-1], pos, t)
+        if park:
+            self.park(path[-1], start_time + len(path) - 1)
+
+    def release_path(self, path: List[int], start_time = 0):
+        for t, pos in enumerate(path, start_time):
+            self.release_vertex(pos, t)
+            if t > start_time:
+                self._edges.discard((t, pos, path[t-start_time-1]))
+        if self._parked.get(path[-1]) == start_time + len(path) - 1:
+            del self._parked[path[-1]]
+
+    def discard_before(self, t: int):
+        # Forgets the reservations of every time step before t, which can no longer
+        # matter to a search starting at t or later. Parked nodes stay parked.
+        for node in list(self._starts):
+            starts, ends = self._starts[node], self._ends[node]
+            i = bisect_right(ends, t)
+            if i == len(ends):
+                del self._starts[node]
+                del self._ends[node]
+                continue
+            del starts[:i]
+            del ends[:i]
+            starts[0] = max(starts[0], t)
+        self._edges = {edge for edge in self._edges if edge[0] >= t}
+
+    def is_vertex_reserved(self, node: int, t: int) -> bool:
+        parked = self._parked.get(node)
+        if parked is not None and t >= parked:
+            return True
+        starts = self._starts.get(node)
+        if not starts:
+            return False
+        i = bisect_right(starts, t) - 1
+        return i >= 0 and t < self._ends[node][i]
+
+    def is_edge_reserved(self, origin: int, destination: int, t: int) -> bool:
+        return (t, origin, destination) in self._edges
+
+    def is_reserved(self, origin: int, destination: int, t: int) -> bool:
+        # whether moving (or waiting, if origin == destination) into destination at t is blocked
+        return self.is_vertex_reserved(destination, t) or (t, origin, destination) in self._edges
+
+    def last_reserved(self, node: int) -> float:
+        # -1 if the node is never reserved, infinity if an agent is parked on it
+        if node in self._parked:
+            return float("+inf")
+        ends = self._ends.get(node)
+        return ends[-1] - 1 if ends else -1
+
+    def at(self, t: int) -> Set[Tuple[int,int]]:
+        # Reservations at a single time step as (node, node) for occupied nodes and
+        # (node, previous node) for moves, the form the visualizer draws
+        result = {(node, node) for node in self._parked if t >= self._parked[node]}
+        for node, starts in self._starts.items():
+            i = bisect_right(starts, t) - 1
+            if i >= 0 and t < self._ends[node][i]:
+                result.add((node, node))
+        result.update((node, previous) for t_edge, node, previous in self._edges if t_edge == t)
+        return result
+
+    def __getitem__(self, t: int) -> Set[Tuple[int,int]]:
+        return self.at(t)
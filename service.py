@@ -0,0 +1,279 @@
+import argparse
+import asyncio
+import json
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+from graph import GridGraph
+from loader import read_grid
+from mapf import a_star_space_time
+from reservations import ReservationTable
+from stats import SearchStats
+
+# Requests arriving within this many seconds of the first one are handled together
+BATCH_WINDOW = 0.005
+# Reservations older than the clock are dropped every this many time steps
+GC_INTERVAL = 64
+
+class PlanningService:
+    # Lifelong multi-agent planning on one map. Agents come and go and get new goals at
+    # any time; only the agents a request is about are replanned, from wherever they
+    # are at the current time step, around the plans of everyone else. The reservation
+    # table, the heuristic caches of the graph and every agent's plan persist between
+    # requests, and the clock only moves forward.
+    def __init__(self, graph: GridGraph, lookahead: int | None = None, stats: SearchStats | None = None):
+        self.graph = graph
+        # how many time steps ahead of the clock a plan may reach. Searches for goals that
+        # can't be reached explore everything up to it, so it bounds the time they take.
+        self.lookahead = lookahead if lookahead is not None else 2 * (graph.dim_x + graph.dim_y)
+        self.stats = stats
+        self.now = 0
+        self.reservations = ReservationTable()
+        # name -> (plan, time step of its first position, goal)
+        self.agents: Dict[str, Tuple[List[int], int, int]] = {}
+        self._collected = 0
+
+    def position(self, name: str) -> int:
+        path, start_time, _ = self.agents[name]
+        return path[min(self.now - start_time, len(path) - 1)]
+
+    def _cell(self, request: Dict, key: str) -> int:
+        value = request.get(key)
+        if not (isinstance(value, list) and len(value) == 2 and all(isinstance(v, int) for v in value)):
+            raise ValueError(f"'{key}' must be [x, y]")
+        x, y = value
+        if not (0 <= x < self.graph.dim_x and 0 <= y < self.graph.dim_y) or not self.graph.wall_bitmap().is_free(x, y):
+            raise ValueError(f"{key} {value} is not a free cell")
+        return self.graph.id_from_coords(x, y)
+
+    def _valid_goal(self, request: Dict) -> bool:
+        try:
+            self._cell(request, "goal")
+            return True
+        except ValueError:
+            return False
+
+    def _coords(self, path: List[int]) -> List[List[int]]:
+        return [list(self.graph.coords_from_id(n)) for n in path]
+
+    def set_goal(self, name: str, goal: int, start: int | None = None) -> Tuple[List[int], int]:
+        # Plans name from its position now (or from start, for a new agent) to goal and
+        # returns the plan and its start time. If there is no plan, a known agent keeps the
+        # one it had and a new agent is not added; ValueError is raised either way.
+        horizon = self.now + self.lookahead
+        if name in self.agents:
+            if start is not None and start != self.position(name):
+                raise ValueError(f"agent {name} is not at the given start")
+            old_path, old_start, old_goal = self.agents[name]
+            start = self.position(name)
+            self.reservations.release_path(old_path, old_start)
+            path = a_star_space_time(self.graph, start, goal, self.reservations, horizon, self.stats, self.now)
+            if path is None:
+                self.reservations.reserve_path(old_path, old_start)
+                raise ValueError(f"no plan for agent {name}, it keeps its previous goal")
+        else:
+            if start is None:
+                raise ValueError(f"new agent {name} needs a start")
+            if self.reservations.is_vertex_reserved(start, self.now):
+                raise ValueError(f"start of agent {name} is occupied")
+            path = a_star_space_time(self.graph, start, goal, self.reservations, horizon, self.stats, self.now)
+            if path is None:
+                raise ValueError(f"no plan for agent {name}")
+        self.reservations.reserve_path(path, self.now)
+        self.agents[name] = (path, self.now, goal)
+        return path, self.now
+
+    def remove(self, name: str):
+        path, start_time, _ = self.agents.pop(name)
+        self.reservations.release_path(path, start_time)
+
+    def advance(self, steps = 1):
+        self.now += steps
+        if self.now - self._collected >= GC_INTERVAL:
+            self.collect()
+
+    def collect(self):
+        # Drops the past: reservations before now and the visited part of every plan. A
+        # plan that already ended keeps its last position at the time it got there, which
+        # is what release_path needs to find the agent's parking spot.
+        self.reservations.discard_before(self.now)
+        for name, (path, start_time, goal) in self.agents.items():
+            done = min(self.now - start_time, len(path) - 1)
+            if done > 0:
+                self.agents[name] = (path[done:], start_time + done, goal)
+        self._collected = self.now
+
+    def handle(self, requests: List[Dict]) -> List[Dict]:
+        # Handles a batch of requests in order and returns a response for each. A goal
+        # request followed by another valid one for the same agent in the same batch, with
+        # no clock change in between, is not planned at all.
+        superseded = set()
+        latest: Dict[str, int] = {}
+        for i, request in enumerate(requests):
+            if not isinstance(request, dict):
+                continue
+            if request.get("op") == "advance":
+                latest.clear()
+            elif request.get("op") == "goal" and isinstance(request.get("agent"), str) and self._valid_goal(request):
+                if request["agent"] in latest:
+                    superseded.add(latest[request["agent"]])
+                latest[request["agent"]] = i
+
+        responses = []
+        for i, request in enumerate(requests):
+            if not isinstance(request, dict):
+                responses.append({"ok": False, "error": "a request must be a JSON object"})
+                continue
+            response = {"id": request["id"]} if "id" in request else {}
+            try:
+                response.update(self._handle(request, i in superseded))
+                response["ok"] = True
+            except ValueError as e:
+                response.update(ok=False, error=str(e))
+            responses.append(response)
+        return responses
+
+    def _handle(self, request: Dict, superseded: bool) -> Dict:
+        op = request.get("op")
+        name = request.get("agent")
+        if op in ("goal", "remove", "path") and not isinstance(name, str):
+            raise ValueError("'agent' must be a name")
+        if op in ("remove", "path") and name not in self.agents:
+            raise ValueError(f"unknown agent {name}")
+        if op == "goal":
+            goal = self._cell(request, "goal")
+            start = self._cell(request, "start") if "start" in request else None
+            if superseded:
+                return {"agent": name, "superseded": True}
+            path, start_time = self.set_goal(name, goal, start)
+            return {"agent": name, "time": start_time, "path": self._coords(path)}
+        if op == "remove":
+            self.remove(name)
+            return {"agent": name}
+        if op == "path":
+            path, start_time, _ = self.agents[name]
+            done = min(self.now - start_time, len(path) - 1)
+            return {"agent": name, "time": self.now, "path": self._coords(path[done:])}
+        if op == "advance":
+            steps = request.get("steps", 1)
+            if not isinstance(steps, int) or steps < 0:
+                raise ValueError("'steps' must be a non-negative integer")
+            self.advance(steps)
+            return {"time": self.now}
+        if op == "status":
+            return {"time": self.now, "agents": {n: list(self.graph.coords_from_id(self.position(n))) for n in self.agents}}
+        raise ValueError(f"unknown op {op!r}")
+
+async def _batcher(service: PlanningService, queue: "asyncio.Queue[Tuple[Dict, Callable[[Dict], None]]]", window: float):
+    # Waits for a request, collects whatever else arrives within the window and handles
+    # it all as one batch. Planning runs on the event loop, so reading goes on between
+    # batches, not during them.
+    while True:
+        batch = [await queue.get()]
+        deadline = time.monotonic() + window
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        responses = service.handle([request for request, _ in batch])
+        for (_, respond), response in zip(batch, responses):
+            respond(response)
+            queue.task_done()
+
+def _parse(line: str) -> Dict | None:
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError:
+        return None
+
+async def _ticker(service: PlanningService, queue: asyncio.Queue, tick: float):
+    # Advances the clock by one step every tick seconds, queued like any other request so
+    # it's ordered with them
+    while True:
+        await asyncio.sleep(tick)
+        await queue.put(({"op": "advance"}, lambda response: None))
+
+async def serve_stdio(service: PlanningService, window = BATCH_WINDOW, tick: float | None = None):
+    # JSON lines on stdin, one response line per request on stdout, until stdin closes
+    queue = asyncio.Queue()
+    tasks = [asyncio.create_task(_batcher(service, queue, window))]
+    if tick is not None:
+        tasks.append(asyncio.create_task(_ticker(service, queue, tick)))
+    def respond(response: Dict):
+        sys.stdout.write(json.dumps(response) + "\n")
+        sys.stdout.flush()
+    while True:
+        line = await asyncio.to_thread(sys.stdin.readline)
+        if line == "":
+            break
+        if line.strip() != "":
+            await queue.put((_parse(line), respond))
+    # answer the last batch before leaving
+    await queue.join()
+    for task in tasks:
+        task.cancel()
+
+async def serve_socket(service: PlanningService, host = "127.0.0.1", port = 0, path: str | None = None,
+    window = BATCH_WINDOW, tick: float | None = None):
+    # JSON lines over TCP on host:port, or over a unix socket at path. Every connection
+    # shares the one service, and requests from all of them are batched together.
+    queue = asyncio.Queue()
+    asyncio.create_task(_batcher(service, queue, window))
+    if tick is not None:
+        asyncio.create_task(_ticker(service, queue, tick))
+
+    async def connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        def respond(response: Dict):
+            if not writer.is_closing():
+                writer.write((json.dumps(response) + "\n").encode())
+        try:
+            while line := await reader.readline():
+                if line.strip() != b"":
+                    await queue.put((_parse(line), respond))
+                await writer.drain()
+        finally:
+            writer.close()
+
+    if path is not None:
+        server = await asyncio.start_unix_server(connection, path)
+    else:
+        server = await asyncio.start_server(connection, host, port)
+    addresses = ", ".join(str(s.getsockname()) for s in server.sockets)
+    print(f"planning service listening on {addresses}", file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Long-running planning service: JSON line requests to set agent goals, "
+        "advance the clock and read positions and plans")
+    parser.add_argument("-f", "--file", default = "grid.txt", type=str, dest="file",
+        help="the map to plan on; the agents in it are added with their goals at time step 0")
+    parser.add_argument("--port", type=int, default=None, dest="port",
+        help="listen on this local TCP port instead of reading stdin")
+    parser.add_argument("--unix", default=None, dest="unix",
+        help="listen on a unix socket at this path instead of reading stdin")
+    parser.add_argument("--batch-window", type=float, default=BATCH_WINDOW * 1000, dest="batch_window",
+        help="milliseconds to collect requests for before planning them together")
+    parser.add_argument("--tick", type=float, default=None, dest="tick",
+        help="advance the clock by a time step every TICK seconds; otherwise only 'advance' requests move it")
+    parser.add_argument("--lookahead", type=int, default=None, dest="lookahead",
+        help="how many time steps ahead of the clock a plan may reach (default: twice the map's width plus height)")
+    args = parser.parse_args()
+
+    graph, agents = read_grid(args.file)
+    service = PlanningService(graph, args.lookahead)
+    for name in sorted(agents):
+        try:
+            service.set_goal(name, agents[name].goal, agents[name].init_pos)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+    window = args.batch_window / 1000
+    if args.port is not None or args.unix is not None:
+        asyncio.run(serve_socket(service, port=args.port or 0, path=args.unix, window=window, tick=args.tick))
+    else:
+        asyncio.run(serve_stdio(service, window, args.tick))
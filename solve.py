@@ -0,0 +1,104 @@
+import argparse
+import json
+import sys
+import time
+from typing import Dict, List
+
+from agent import Agent
+from graph import Graph, GridGraph
+from jps import jump_point_search
+from loader import read_grid
+from mapf import SOLVERS, a_star_coop, multi_agent_pathfinding_with_reservations
+from plans import save_agents
+from reservations import ReservationTable
+from stats import SearchStats
+
+def run_mapf(graph: Graph, agents: List[Agent], space_time = False, horizon: int | None = None,
+    window: int | None = None, solver = "prioritized", stats: SearchStats | None = None) -> ReservationTable:
+    start = [a.init_pos for a in agents]
+    goal = [a.goal for a in agents]
+    positions, res = multi_agent_pathfinding_with_reservations(graph, start, goal, space_time, horizon, window, solver, stats)
+    for i,path in enumerate(positions):
+        if path == None:
+            agents[i].coop_path = [-1]
+        else:
+            agents[i].coop_path = path
+    return res
+
+def run_astar(graph: Graph, agents: List[Agent]):
+    for a in agents:
+        # nothing to avoid, so grids can jump over the straight runs
+        if isinstance(graph, GridGraph):
+            path = jump_point_search(graph, a.init_pos, a.goal)
+        else:
+            path = a_star_coop(graph, a.init_pos, a.goal, ReservationTable())
+        if path == None:
+            a.optimal_path = [-1]
+        else:
+            a.optimal_path = path
+
+def plans_to_json(graph: GridGraph, agents: List[Agent]) -> Dict:
+    result = {}
+    for a in agents:
+        path = None if a.coop_path == [-1] else [list(graph.coords_from_id(n)) for n in a.coop_path]
+        result[a.name] = {
+            "start": list(graph.coords_from_id(a.init_pos)),
+            "goal": list(graph.coords_from_id(a.goal)),
+            "path": path,
+        }
+    return result
+
+def solve(filename: str, space_time = False, horizon: int | None = None,
+    window: int | None = None, solver = "prioritized", stats: SearchStats | None = None,
+    save: str | None = None) -> Dict:
+    graph, agents = read_grid(filename)
+    agents = [agents[a] for a in sorted(agents.keys())]
+    t0 = time.perf_counter()
+    run_mapf(graph, agents, space_time, horizon, window, solver, stats)
+    t1 = time.perf_counter()
+    if save is not None:
+        save_agents(save, graph, agents)
+    solved = sum(1 for a in agents if a.coop_path != [-1])
+    if stats is not None:
+        # report agents by name rather than by their index in the sorted list
+        for record in stats.agents:
+            record["agent"] = agents[record["agent"]].name
+    return {
+        "file": filename,
+        "solver": solver,
+        "time": t1 - t0,
+        "solved": solved,
+        "success_rate": solved / len(agents) if agents else 1.0,
+        "agents": plans_to_json(graph, agents),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve a grid file and print the plans as JSON, without any rendering")
+    parser.add_argument("-f", "--file", default = "grid.txt", type=str, dest="file",
+        help="use a specific file to initialize the grid")
+    parser.add_argument("-o", "--output", default=None, dest="output",
+        help="write the plans to this file instead of stdout")
+    parser.add_argument("--save", default=None, dest="save",
+        help="also save the plans to this file in the compact plan format (see plans.py)")
+    parser.add_argument("--solver", choices=SOLVERS, default="prioritized", dest="solver")
+    parser.add_argument("-T", "--space-time", action="store_true", dest="space_time")
+    parser.add_argument("--horizon", type=int, default=None, dest="horizon")
+    parser.add_argument("-w", "--window", type=int, default=None, dest="window")
+    parser.add_argument("-s", "--stats", action="store_true", dest="stats",
+        help="include search counters (expansions, heap pushes, reservation probes, waits) per agent")
+    parser.add_argument("--trace", default=None, dest="trace",
+        help="write a Chrome trace (chrome://tracing, Perfetto) of the planning timeline to this file")
+    args = parser.parse_args()
+
+    stats = SearchStats(trace=args.trace is not None) if args.stats or args.trace else None
+    result = solve(args.file, args.space_time, args.horizon, args.window, args.solver, stats, args.save)
+    if args.stats:
+        result["stats"] = stats.summary()
+    if args.trace:
+        stats.save_chrome_trace(args.trace)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f)
+    else:
+        json.dump(result, sys.stdout)
+        print()
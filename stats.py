@@ -0,0 +1,85 @@
+import json
+import time
+from typing import Dict, List
+
+class SearchStats:
+    # Opt-in counters for the planners. Pass an instance as `stats=` to collect them;
+    # the planners skip every bookkeeping step when they get None.
+    COUNTERS = ["expansions", "pushes", "probes", "waits"]
+
+    def __init__(self, trace = False):
+        self.expansions = 0   # nodes (or (node, t) states) taken off the open list
+        self.pushes = 0       # entries pushed onto the open list
+        self.probes = 0       # reservation table queries
+        self.waits = 0        # wait steps in the returned paths
+        self.searches = 0     # low-level searches run
+        self.limits = 0       # searches cut short by a node or time limit
+        self.agents: List[Dict] = []
+        self.trace = trace
+        self.events: List[Dict] = []
+        self._origin = time.perf_counter()
+        self._open: Dict[int, Dict] = {}
+
+    def _now_us(self) -> float:
+        return (time.perf_counter() - self._origin) * 1e6
+
+    def add_path(self, path: List[int] | None):
+        self.searches += 1
+        if path:
+            self.waits += sum(1 for a,b in zip(path, path[1:]) if a == b)
+
+    def begin_agent(self, agent: int, **info):
+        self._open[agent] = {"start": self._now_us(), "info": info,
+            **{name: getattr(self, name) for name in SearchStats.COUNTERS}}
+
+    def end_agent(self, agent: int, path: List[int] | None):
+        began = self._open.pop(agent)
+        end = self._now_us()
+        record = {
+            "agent": agent,
+            **began["info"],
+            "time": (end - began["start"]) / 1e6,
+            "success": path is not None,
+            "length": len(path) - 1 if path else None,
+            **{name: getattr(self, name) - began[name] for name in SearchStats.COUNTERS},
+        }
+        self.agents.append(record)
+        if self.trace:
+            self.events.append({"name": f"agent {agent}", "cat": "plan", "ph": "X", "pid": 0, "tid": 0,
+                "ts": began["start"], "dur": end - began["start"], "args": record})
+
+    def empty_copy(self) -> "SearchStats":
+        # Same settings and time origin, nothing counted yet, e.g. for a worker process
+        copy = SearchStats(self.trace)
+        copy._origin = self._origin
+        return copy
+
+    def merge(self, other: "SearchStats", **info):
+        # Adds what other counted, tagging its per-agent records with info
+        for name in SearchStats.COUNTERS + ["searches", "limits"]:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.agents.extend({**record, **info} for record in other.agents)
+        self.events.extend(other.events)
+
+    def event(self, name: str, **args):
+        # an instant event on the timeline, e.g. a constraint-tree expansion
+        if self.trace:
+            self.events.append({"name": name, "cat": "event", "ph": "i", "s": "t", "pid": 0, "tid": 0,
+                "ts": self._now_us(), "args": args})
+
+    def summary(self) -> Dict:
+        return {
+            **{name: getattr(self, name) for name in SearchStats.COUNTERS},
+            "searches": self.searches,
+            "limits": self.limits,
+            "time": sum(a["time"] for a in self.agents),
+            "agents": self.agents,
+        }
+
+    def chrome_trace(self) -> Dict:
+        # Loadable in chrome://tracing or Perfetto
+        return {"traceEvents": self.events, "displayTimeUnit": "ms"}
+
+    def save_chrome_trace(self, filename: str):
+        with open(filename, "w") as f:
+            json.dump(self.chrome_trace(), f)
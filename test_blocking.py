@@ -0,0 +1,49 @@
+import random
+from graph import GridGraph
+
+dim = 16
+rng = random.Random(2)
+grid = ["".join("#" if rng.random() < 0.2 else " " for _ in range(dim)) for _ in range(dim)]
+
+for frozen in (False, True):
+    graph = GridGraph.from_grid(grid)
+    if frozen:
+        graph.freeze()
+    free = [n for n in range(graph.size) if graph.neighbours(n) != []]
+    goals = rng.sample(free, 4)
+    origins = rng.sample(free, 4)
+
+    def check(step: str):
+        # every cached distance has to match the ones of a graph built from scratch
+        fresh = GridGraph.from_grid(["".join(row) for row in graph.cells])
+        for goal in goals:
+            assert list(graph.distances_to(goal)) == list(fresh.distances_to(goal)), (step, goal)
+        for origin in origins:
+            for goal in goals:
+                assert graph.distance(origin, goal) == fresh.distance(origin, goal), (step, origin, goal)
+            assert sorted(graph.neighbours(origin)) == sorted(fresh.neighbours(origin)), (step, origin)
+
+    print("Filling the distance caches" + (" of a frozen graph" if frozen else ""))
+    check("start")
+
+    print("Blocking and unblocking cells")
+    blocked = []
+    for step in range(60):
+        if blocked and rng.random() < 0.4:
+            x, y = blocked.pop(rng.randrange(len(blocked)))
+            graph.unblock_cell(x, y)
+            check(f"unblock {x},{y}")
+        else:
+            x, y = graph.coords_from_id(rng.choice(free))
+            if graph.cells[y][x] == GridGraph.WALL_CHAR:
+                continue
+            graph.block_cell(x, y)
+            blocked.append((x, y))
+            check(f"block {x},{y}")
+    assert graph.frozen == frozen
+
+    print("Opening a cell that was a wall from the start")
+    x, y = next((x, y) for y in range(1, dim - 1) for x in range(1, dim - 1) if grid[y][x] == "#" and grid[y][x+1] == " ")
+    graph.unblock_cell(x, y)
+    check(f"unblock {x},{y}")
+print("Blocking checks passed")
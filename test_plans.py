@@ -0,0 +1,51 @@
+import os
+import random
+import tempfile
+from graph import GridGraph
+from plans import CHECKPOINT_STEPS, CompactPath, PlanFile, save_plans
+
+dim = 40
+rng = random.Random(1)
+graph = GridGraph.from_grid([" " * dim for _ in range(dim)])
+
+# a random walk with waits and long straight runs, several checkpoints long
+path = [graph.id_from_coords(dim // 2, dim // 2)]
+while len(path) < 5 * CHECKPOINT_STEPS + 37:
+    x, y = graph.coords_from_id(path[-1])
+    dx, dy = rng.choice([(0, 0), (0, -1), (0, 1), (-1, 0), (1, 0)])
+    for _ in range(rng.choice([1, 1, 2, 40])):
+        if 0 <= x + dx < dim and 0 <= y + dy < dim:
+            x, y = x + dx, y + dy
+        path.append(graph.id_from_coords(x, y))
+
+print(f"Encoding a path of {len(path)} positions")
+compact = CompactPath.from_path(path, dim)
+assert len(compact) == len(path)
+assert list(compact) == path and compact == path
+
+print("Reading positions in random order")
+for t in rng.sample(range(len(path)), len(path)):
+    assert compact[t] == path[t], t
+for t in range(len(path) - 1, -1, -1):
+    assert compact[t] == path[t], t
+for t in range(1, len(path) + 1):
+    assert compact[-t] == path[-t], -t
+assert compact[CHECKPOINT_STEPS - 1:3 * CHECKPOINT_STEPS + 5:7] == path[CHECKPOINT_STEPS - 1:3 * CHECKPOINT_STEPS + 5:7]
+try:
+    compact[len(path)]
+    assert False, "read past the end"
+except IndexError:
+    pass
+
+print("Reading positions from a saved plan file")
+with tempfile.TemporaryDirectory() as directory:
+    filename = os.path.join(directory, "plans.bin")
+    save_plans(filename, graph, ["a", "b"], [path[0], 0], [path[-1], 1], [path, None])
+    plans = PlanFile(filename)
+    saved = plans.path(0)
+    assert plans.names() == ["a", "b"] and plans.path(1) is None
+    for t in rng.sample(range(len(path)), 500):
+        assert saved[t] == path[t], t
+    assert plans.positions_at(3 * CHECKPOINT_STEPS) == [path[3 * CHECKPOINT_STEPS], None]
+    del saved, plans
+print("Plan checks passed")
@@ -0,0 +1,42 @@
+from reservations import ReservationTable
+
+r = ReservationTable()
+
+print("Reserving vertices")
+r.reserve_vertex(7, 2, 5)
+r.reserve_vertex(7, 5)
+r.reserve_vertex(7, 10, 12)
+assert [t for t in range(14) if r.is_vertex_reserved(7, t)] == [2, 3, 4, 5, 10, 11]
+assert r.last_reserved(7) == 11 and r.horizon == 11
+assert r.last_reserved(8) == -1
+
+print("Releasing vertices")
+r.release_vertex(7, 3)
+assert [t for t in range(14) if r.is_vertex_reserved(7, t)] == [2, 4, 5, 10, 11]
+r.release_vertex(7, 0, 20)
+assert not any(r.is_vertex_reserved(7, t) for t in range(20))
+
+print("Reserving and releasing paths")
+path = [1, 2, 2, 3]
+r.reserve_path(path, 4)
+assert r.is_reserved(5, 2, 5) and r.is_reserved(2, 2, 6)
+# swapping places with the agent moving 1 -> 2 at time step 5
+assert r.is_edge_reserved(2, 1, 5) and not r.is_edge_reserved(1, 2, 5)
+# parked on its goal for good
+assert r.is_vertex_reserved(3, 7) and r.is_vertex_reserved(3, 1000) and not r.is_vertex_reserved(3, 6)
+assert r.last_reserved(3) == float("+inf")
+r.release_path(path, 4)
+assert not any(r.is_vertex_reserved(n, t) for n in range(5) for t in range(1000))
+assert not r.is_edge_reserved(2, 1, 5)
+
+print("Discarding the past")
+r.reserve_path([5, 6, 7, 8, 9], park=False)
+r.reserve_vertex(6, 8, 10)
+r.park(0, 1)
+r.discard_before(3)
+assert [n for n in range(5, 10) if r.is_vertex_reserved(n, 3) or r.is_vertex_reserved(n, 4)] == [8, 9]
+assert not r.is_edge_reserved(6, 5, 1) and r.is_edge_reserved(8, 7, 3) and r.is_edge_reserved(9, 8, 4)
+assert [t for t in range(12) if r.is_vertex_reserved(6, t)] == [8, 9]
+assert r.is_vertex_reserved(0, 3)
+assert r.at(4) == {(0, 0), (9, 9), (9, 8)}
+print("Reservation checks passed")
@@ -1,244 +1,303 @@
-from collections import defaultdict
-import time
-from typing import Dict, Generator, List, Set, Tuple
-from agent import Agent
-from graph import Graph, GridGraph
-
-import argparse
-import pygame
-
-from mapf import a_star_coop, multi_agent_pathfinding, multi_agent_pathfinding_with_reservations
-
-def read_grid(filename: str) -> Tuple[GridGraph, Dict[str, Agent]]:
-    grid : List[str] = []
-    with open(filename, 'r') as f:
-        for line in f:
-            grid.append(line.strip())
-    
-    graph = GridGraph(max(len(row) for row in grid), len(grid))
-    graph.load_cells(grid)
-    agents: Dict[str, Agent] = dict()
-    for y,row in enumerate(grid):
-        for x,c in enumerate(row):
-            if c in ["#", " "]: continue
-            c_low = c.lower()
-            c_upp = c.upper()
-            if c_low == c_upp: continue
-            if c_low not in agents:
-                agents[c_low] = Agent(c_low, -1, -1)
-            if c == c_low:
-                agents[c_low].init_pos = graph.id_from_coords(x,y)
-            else:
-                agents[c_low].goal = graph.id_from_coords(x,y)
-    return (graph, agents)
-
-def generate_colors(n: int, s: float = 100, v: float = 100, a: float = 100) -> Generator[pygame.Color, any, any]:
-    hdelta = 360 / n
-    for i in range(n):
-        color = pygame.Color(0,0,0)
-        color.hsva = (hdelta * i, s, v, a)
-        yield color
-        
-def to_html_color(color: pygame.color.Color):
-    value = (color.r << 16) + (color.g << 8) + color.b
-    return f"#{value:x}"
-
-def run_mapf(graph: Graph, agents: List[Agent]) -> Dict[int, Set[int]]:
-    start = [a.init_pos for a in agents]
-    goal = [a.goal for a in agents]
-    positions, res = multi_agent_pathfinding_with_reservations(graph, start, goal)
-    for i,path in enumerate(positions):
-        if path == None:
-            agents[i].coop_path = [-1]
-        else:
-            agents[i].coop_path = path
-    return res
-
-def run_astar(graph: Graph, agents: List[Agent]):
-    for a in agents:
-        path = a_star_coop(graph, a.init_pos, a.goal, defaultdict(set))
-        if path == None:
-            a.optimal_path = [-1]
-        else:
-            a.optimal_path = path
-            
-def interpolate(a: float, b: float, t: float):
-    return a * (1-t) + b * t
-def vec_interpolate(a: Tuple[float,...], b: Tuple[float,...], t: float):
-    return tuple(interpolate(va,vb,t) for va,vb in zip(a,b))
-
-COOP_MODE = 1
-INDEP_MODE = 2
-
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser()
-    parser.add_argument("-f", "--file", default = "grid.txt", type=str, dest="file",
-        help="use a specific file to initialize the grid")
-    parser.add_argument("-c", "--continuous", action="store_true", dest="continuous",
-        help="view movements in the grid with interpolation instead of discretized")
-    parser.add_argument("-S", "--speed", type=float, dest="speed", default=5,
-        help="sets the speed (in nodes per second) of continuous movement. Requires --continuous.")
-    parser.add_argument("-r", "--reservations", action="store_true", dest="reservations",
-        help="visualize reservation at any given time step as grey squares")
-    parser.add_argument("-g", "--graph", action="store_true", dest="graph",
-        help="open a pdf viewer of the graph that represents the desired grid")
-    parser.add_argument("-W", "--width", type=int, default=1280, dest="display_width",
-        help="sets the maximum display width")
-    parser.add_argument("-H", "--height", type=int, default=720, dest="display_height",
-        help="sets the maximum display height")
-    args = parser.parse_args()
-    
-    filename = args.file
-    SHOW_RESERVATIONS = args.reservations
-    SHOW_GRAPH = args.graph
-    CONTINUOUS = args.continuous
-    SPEED = args.speed
-    SHOW_PATHS = False
-    
-    graph, agents = read_grid(filename)
-    # Sort agents by name for iteration over it later
-    agents = {a: agents[a] for a in sorted(agents.keys())}
-    agent_colors: Dict[str, pygame.Color] = {}
-    _colorlist = list(generate_colors(len(agents),s=80,v=80))
-    single_agent = len(agents) == 1
-    agent_offsets: Dict[str, float] = {a.name: 0.5 if single_agent else (0.3 + i * 0.4 / (len(agents) - 1)) for i,a in enumerate(agents.values())}
-    for a, c in zip(agents.keys(), _colorlist):
-        agent_colors[a] = c
-    
-    DISPLAY_WIDTH = args.display_width
-    DISPLAY_HEIGHT = args.display_height
-    
-    t0 = time.time()
-    res = run_mapf(graph, list(agents.values()))
-    t1 = time.time()    
-    run_astar(graph, list(agents.values()))
-    t2 = time.time()
-    
-    print()
-    print( "======================================")
-    print(f"Time cost - cooperative A*: {1000 * (t1 - t0):.1f}ms")
-    print(f"Time cost - regular A*:     {1000 * (t2 - t1):.1f}ms")
-    print( "======================================")
-    
-    move_mode = COOP_MODE
-    for a, agent in agents.items():
-        agent.positions = agent.coop_path
-    
-    pygame.init()
-    clock = pygame.time.Clock()
-    running = True
-    agent_time = 0
-    partial_time = 0
-    
-    TILE_SIZE = min(DISPLAY_WIDTH // graph.dim_x, DISPLAY_HEIGHT // graph.dim_y)
-    screen = pygame.display.set_mode((TILE_SIZE * graph.dim_x, TILE_SIZE * graph.dim_y))
-    font = pygame.font.SysFont(None, int(min(TILE_SIZE * 0.6, screen.get_width() * 0.025)))
-    
-    # graph.visualize(show_distances=False)
-    
-    controls_render = font.render(f"[Left]/[A] : Back | [Right]/[D] : Forward | [0]: Start | [9]: End | [M] : Toggle Move Mode | [P] : Toggle Path Display", True, (255,255,255))
-    
-    if SHOW_GRAPH:
-        colors = ["black" for _ in range(graph.size)]
-        for i,a in enumerate(agents.values()):
-            colors[a.init_pos] = to_html_color(agent_colors[a.name])
-        graph.visualize("Grid Visualization",colors=colors,show_distances=False,show_isolated=False)
-    pressed = defaultdict(bool)
-    while running:
-        # poll for events
-        # pygame.QUIT event means the user clicked X to close your window
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-
-        screen.fill("black")
-        for y,row in enumerate(graph.cells):
-            for x,c in enumerate(row):
-                if c != GridGraph.WALL_CHAR:
-                    pygame.draw.rect(screen, "white", (x * TILE_SIZE, y * TILE_SIZE, TILE_SIZE, TILE_SIZE))
-        
-        for aname, agent in agents.items():
-            color = agent_colors[aname]
-            xnow, ynow = graph.coords_from_id(agent.get_position(agent_time))
-            xnext, ynext = graph.coords_from_id(agent.get_position(agent_time + 1))
-            x,y = vec_interpolate((xnow,ynow), (xnext,ynext),partial_time)
-            pygame.draw.circle(screen, color, ((x + 0.5) * TILE_SIZE, (y + 0.5) * TILE_SIZE), 0.4 * TILE_SIZE)
-            gx,gy = graph.coords_from_id(agent.goal)
-            pygame.draw.line(screen,color,((gx+0.2) * TILE_SIZE, (gy+0.2) * TILE_SIZE), ((gx+0.8) * TILE_SIZE, (gy+0.8) * TILE_SIZE), 5)
-            pygame.draw.line(screen,color,((gx+0.8) * TILE_SIZE, (gy+0.2) * TILE_SIZE), ((gx+0.2) * TILE_SIZE, (gy+0.8) * TILE_SIZE), 5)
-            sx,sy = graph.coords_from_id(agent.init_pos)
-            pygame.draw.circle(screen, color, ((sx + 0.5) * TILE_SIZE, (sy + 0.5) * TILE_SIZE), 0.4 * TILE_SIZE, width=3)
-
-            if SHOW_PATHS:
-                for n1, n2 in zip(agent.positions, agent.positions[1:]):
-                    x1, y1 = graph.coords_from_id(n1)
-                    x2, y2 = graph.coords_from_id(n2)
-                    o = agent_offsets[aname]
-                    pygame.draw.line(screen,color,((x1+o) * TILE_SIZE, (y1+o) * TILE_SIZE), ((x2+o) * TILE_SIZE, (y2+o) * TILE_SIZE), 2)
-
-        if SHOW_RESERVATIONS:
-            for r1,r2 in res[agent_time]:
-                x,y = graph.coords_from_id(r1)
-                if r1==r2:
-                    pygame.draw.rect(screen,(100,100,100),((x + 0.3) * TILE_SIZE, (y + 0.3) * TILE_SIZE, TILE_SIZE * 0.4, TILE_SIZE * 0.4))
-                else:
-                    x2,y2 = graph.coords_from_id(r2)
-                    pygame.draw.polygon(screen,(100,100,100),[((x + 0.3) * TILE_SIZE, (y + 0.3) * TILE_SIZE),((x + 0.7) * TILE_SIZE, (y + 0.7) * TILE_SIZE), ((x2 + 0.5) * TILE_SIZE, (y2 + 0.5) * TILE_SIZE)])
-                    pygame.draw.polygon(screen,(100,100,100),[((x + 0.3) * TILE_SIZE, (y + 0.7) * TILE_SIZE),((x + 0.7) * TILE_SIZE, (y + 0.3) * TILE_SIZE), ((x2 + 0.5) * TILE_SIZE, (y2 + 0.5) * TILE_SIZE)])
-                
-            
-        keys = pygame.key.get_pressed()
-        lpress = bool(keys[pygame.K_a]) or bool(keys[pygame.K_LEFT])
-        rpress = bool(keys[pygame.K_d]) or bool(keys[pygame.K_RIGHT])
-        if not CONTINUOUS:
-            if lpress and not pressed["left"]:
-                agent_time = max(agent_time - 1, 0)
-            pressed["left"] = lpress
-            if rpress and not pressed["right"]:
-                agent_time += 1
-            pressed["right"] = rpress
-        else:
-            if lpress:
-                partial_time -= dt * SPEED
-            if rpress:
-                partial_time += dt * SPEED
-            
-            if partial_time < 0:
-                if agent_time == 0: partial_time = 0
-                else: partial_time += 1; agent_time -= 1
-            elif partial_time >= 1:
-                partial_time -= 1; agent_time += 1
-                
-            
-        mpress = bool(keys[pygame.K_m])
-        if mpress and not pressed["m"]:
-            if move_mode == COOP_MODE:
-                move_mode = INDEP_MODE
-                for a in agents.values(): a.positions = a.optimal_path
-            else:
-                move_mode = COOP_MODE
-                for a in agents.values(): a.positions = a.coop_path
-        pressed["m"] = mpress
-        ppress = bool(keys[pygame.K_p])
-        if ppress and not pressed["p"]:
-            SHOW_PATHS = not SHOW_PATHS
-        pressed["p"] = ppress
-        if keys[pygame.K_0]: agent_time = 0
-        if keys[pygame.K_9]: agent_time = max(len(a.positions) for a in agents.values())
-                    
-        time_render = font.render(f"t = {agent_time}", True, (255,255,255))
-        screen.blit(time_render, (5,5))
-        success_cnt = sum(1 for a in agents.values() if len(a.positions) > 1)
-        success_render = font.render(f"success rate = {success_cnt}/{len(agents)} ({success_cnt/len(agents):.1%})", True, (255,255,255))
-        screen.blit(success_render, (80,5))
-        screen.blit(controls_render, (5,screen.get_height() - font.get_height() - 2))
-
-        # flip() the display to put your work on screen
-        pygame.display.flip()
-
-        # limits FPS to 60
-        # dt is delta time in seconds since last frame, used for framerate-
-        # independent physics.
-        dt = clock.tick(60) / 1000
-
+from collections import OrderedDict, defaultdict
+import math
+import time
+from typing import Dict, Generator, List, Tuple
+from graph import GridGraph
+
+import argparse
+
+# pygame is only imported once something is rendered, so the helpers and the
+# re-exported solver API below can be used headless
+from loader import read_grid
+from mapf import SOLVERS
+from plans import load_agents, save_agents
+from reservations import ReservationTable
+from solve import run_astar, run_mapf
+
+def generate_colors(n: int, s: float = 100, v: float = 100, a: float = 100) -> Generator["pygame.Color", any, any]:
+    import pygame
+    hdelta = 360 / n
+    for i in range(n):
+        color = pygame.Color(0,0,0)
+        color.hsva = (hdelta * i, s, v, a)
+        yield color
+        
+def to_html_color(color: "pygame.Color"):
+    value = (color.r << 16) + (color.g << 8) + color.b
+    return f"#{value:x}"
+
+def interpolate(a: float, b: float, t: float):
+    return a * (1-t) + b * t
+def vec_interpolate(a: Tuple[float,...], b: Tuple[float,...], t: float):
+    return tuple(interpolate(va,vb,t) for va,vb in zip(a,b))
+
+def render_static_map(graph: GridGraph) -> "pygame.Surface":
+    # The whole map at one pixel per cell, drawn scaled up to the viewport every frame
+    import pygame
+    floor, wall = b"\xff\xff\xff", b"\x00\x00\x00"
+    data = b"".join(wall if c == GridGraph.WALL_CHAR else floor for row in graph.cells for c in row)
+    return pygame.image.frombuffer(data, (graph.dim_x, graph.dim_y), "RGB").copy()
+
+def visible_cells(view_x: float, view_y: float, tile: int, width: int, height: int, dim_x: int, dim_y: int) -> Tuple[int,int,int,int]:
+    # Range [x0, x1) x [y0, y1) of the cells at least partly inside the viewport
+    x0 = max(0, math.floor(view_x))
+    y0 = max(0, math.floor(view_y))
+    x1 = min(dim_x, math.ceil(view_x + width / tile))
+    y1 = min(dim_y, math.ceil(view_y + height / tile))
+    return x0, y0, x1, y1
+
+COOP_MODE = 1
+INDEP_MODE = 2
+
+# pixels per cell allowed when zooming in, and the zoom factor of one wheel step
+MAX_TILE_SIZE = 128
+ZOOM_STEP = 1.25
+# time steps whose reservations are kept around for drawing
+RESERVATION_CACHE_SIZE = 256
+
+if __name__ == "__main__":
+    import pygame
+    
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-f", "--file", default = "grid.txt", type=str, dest="file",
+        help="use a specific file to initialize the grid")
+    parser.add_argument("-c", "--continuous", action="store_true", dest="continuous",
+        help="view movements in the grid with interpolation instead of discretized")
+    parser.add_argument("-S", "--speed", type=float, dest="speed", default=5,
+        help="sets the speed (in nodes per second) of continuous movement. Requires --continuous.")
+    parser.add_argument("-r", "--reservations", action="store_true", dest="reservations",
+        help="visualize reservation at any given time step as grey squares")
+    parser.add_argument("-g", "--graph", action="store_true", dest="graph",
+        help="open a pdf viewer of the graph that represents the desired grid")
+    parser.add_argument("-T", "--space-time", action="store_true", dest="space_time",
+        help="plan over (node, time) states with explicit waits instead of the node-based cooperative A*")
+    parser.add_argument("--horizon", type=int, default=None, dest="horizon",
+        help="sets the maximum time step a space-time plan may reach. Requires --space-time.")
+    parser.add_argument("-w", "--window", type=int, default=None, dest="window",
+        help="plan in rounds that only reserve the next WINDOW steps of every agent (windowed cooperative A*)")
+    parser.add_argument("--solver", choices=SOLVERS, default="prioritized", dest="solver",
+        help="multi-agent solver: prioritized planning in name order, the best of many priority orderings, or (bounded-suboptimal) conflict-based search")
+    parser.add_argument("-W", "--width", type=int, default=1280, dest="display_width",
+        help="sets the maximum display width")
+    parser.add_argument("-H", "--height", type=int, default=720, dest="display_height",
+        help="sets the maximum display height")
+    parser.add_argument("--save", default=None, dest="save",
+        help="save the cooperative plans to this file in the compact plan format")
+    parser.add_argument("--load", default=None, dest="load",
+        help="replay the plans saved in this file instead of planning")
+    args = parser.parse_args()
+    
+    filename = args.file
+    SHOW_RESERVATIONS = args.reservations
+    SHOW_GRAPH = args.graph
+    CONTINUOUS = args.continuous
+    SPEED = args.speed
+    SHOW_PATHS = False
+    
+    graph, agents = read_grid(filename)
+    # Sort agents by name for iteration over it later
+    agents = {a: agents[a] for a in sorted(agents.keys())}
+    agent_colors: Dict[str, pygame.Color] = {}
+    _colorlist = list(generate_colors(len(agents),s=80,v=80))
+    single_agent = len(agents) == 1
+    agent_offsets: Dict[str, float] = {a.name: 0.5 if single_agent else (0.3 + i * 0.4 / (len(agents) - 1)) for i,a in enumerate(agents.values())}
+    for a, c in zip(agents.keys(), _colorlist):
+        agent_colors[a] = c
+    
+    DISPLAY_WIDTH = args.display_width
+    DISPLAY_HEIGHT = args.display_height
+    
+    t0 = time.time()
+    if args.load:
+        load_agents(args.load, graph, list(agents.values()))
+        res = ReservationTable()
+        if SHOW_RESERVATIONS:
+            for agent in agents.values():
+                if agent.coop_path != [-1]: res.reserve_path(agent.coop_path)
+    else:
+        res = run_mapf(graph, list(agents.values()), args.space_time, args.horizon, args.window, args.solver)
+    t1 = time.time()
+    if args.save:
+        save_agents(args.save, graph, list(agents.values()))    
+    run_astar(graph, list(agents.values()))
+    t2 = time.time()
+    
+    print()
+    print( "======================================")
+    print(f"Time cost - cooperative A*: {1000 * (t1 - t0):.1f}ms")
+    print(f"Time cost - regular A*:     {1000 * (t2 - t1):.1f}ms")
+    print( "======================================")
+    
+    move_mode = COOP_MODE
+    for a, agent in agents.items():
+        agent.positions = agent.coop_path
+    
+    pygame.init()
+    clock = pygame.time.Clock()
+    running = True
+    agent_time = 0
+    partial_time = 0
+    
+    # large maps start zoomed out to a pixel per cell, the viewport shows the rest
+    TILE_SIZE = max(1, min(DISPLAY_WIDTH // graph.dim_x, DISPLAY_HEIGHT // graph.dim_y))
+    screen = pygame.display.set_mode((min(DISPLAY_WIDTH, TILE_SIZE * graph.dim_x), min(DISPLAY_HEIGHT, TILE_SIZE * graph.dim_y)))
+    font = pygame.font.SysFont(None, max(12, int(min(TILE_SIZE * 0.6, screen.get_width() * 0.025))))
+    
+    # graph.visualize(show_distances=False)
+    
+    controls_render = font.render(f"[Left]/[A] : Back | [Right]/[D] : Forward | [0]: Start | [9]: End | [M] : Toggle Move Mode | [P] : Toggle Path Display | [Drag] : Pan | [Wheel] : Zoom", True, (255,255,255))
+    
+    map_surface = render_static_map(graph)
+    # top left corner of the viewport in cells, and its zoom in pixels per cell
+    view_x, view_y = 0.0, 0.0
+    tile = TILE_SIZE
+    dragging = False
+    # the scaled part of the map currently on screen, redone only when the view changes
+    static_key = None
+    static_render = None
+    # reservations per time step, as cell coordinates
+    reservation_cache: OrderedDict[int, List[Tuple[int,int,int,int]]] = OrderedDict()
+    hud_key = None
+    
+    if SHOW_GRAPH:
+        colors = ["black" for _ in range(graph.size)]
+        for i,a in enumerate(agents.values()):
+            colors[a.init_pos] = to_html_color(agent_colors[a.name])
+        graph.visualize("Grid Visualization",colors=colors,show_distances=False,show_isolated=False)
+    pressed = defaultdict(bool)
+    while running:
+        # poll for events
+        # pygame.QUIT event means the user clicked X to close your window
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                dragging = True
+            elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
+                dragging = False
+            elif event.type == pygame.MOUSEMOTION and dragging:
+                view_x -= event.rel[0] / tile
+                view_y -= event.rel[1] / tile
+            elif event.type == pygame.MOUSEWHEEL and event.y != 0:
+                # zoom around the cell under the cursor
+                mx, my = pygame.mouse.get_pos()
+                cx, cy = view_x + mx / tile, view_y + my / tile
+                new_tile = round(tile * ZOOM_STEP ** event.y)
+                if new_tile == tile: new_tile += 1 if event.y > 0 else -1
+                tile = min(MAX_TILE_SIZE, max(1, new_tile))
+                view_x, view_y = cx - mx / tile, cy - my / tile
+        # keep some of the map on screen
+        view_x = min(max(view_x, 1 - screen.get_width() / tile), graph.dim_x - 1)
+        view_y = min(max(view_y, 1 - screen.get_height() / tile), graph.dim_y - 1)
+        
+        def to_screen(x: float, y: float) -> Tuple[float, float]:
+            return ((x - view_x) * tile, (y - view_y) * tile)
+        vx0, vy0, vx1, vy1 = visible_cells(view_x, view_y, tile, screen.get_width(), screen.get_height(), graph.dim_x, graph.dim_y)
+        def visible(x: float, y: float) -> bool:
+            return vx0 - 1 < x < vx1 and vy0 - 1 < y < vy1
+
+        screen.fill("black")
+        if vx0 < vx1 and vy0 < vy1:
+            if static_key != (vx0, vy0, vx1, vy1, tile):
+                static_render = pygame.transform.scale(map_surface.subsurface((vx0, vy0, vx1 - vx0, vy1 - vy0)), ((vx1 - vx0) * tile, (vy1 - vy0) * tile))
+                static_key = (vx0, vy0, vx1, vy1, tile)
+            screen.blit(static_render, to_screen(vx0, vy0))
+        
+        line_width = max(1, min(5, tile // 8))
+        for aname, agent in agents.items():
+            color = agent_colors[aname]
+            xnow, ynow = graph.coords_from_id(agent.get_position(agent_time))
+            xnext, ynext = graph.coords_from_id(agent.get_position(agent_time + 1))
+            x,y = vec_interpolate((xnow,ynow), (xnext,ynext),partial_time)
+            if visible(x, y):
+                pygame.draw.circle(screen, color, to_screen(x + 0.5, y + 0.5), 0.4 * tile)
+            gx,gy = graph.coords_from_id(agent.goal)
+            if visible(gx, gy):
+                pygame.draw.line(screen,color,to_screen(gx+0.2, gy+0.2), to_screen(gx+0.8, gy+0.8), line_width)
+                pygame.draw.line(screen,color,to_screen(gx+0.8, gy+0.2), to_screen(gx+0.2, gy+0.8), line_width)
+            sx,sy = graph.coords_from_id(agent.init_pos)
+            if visible(sx, sy):
+                pygame.draw.circle(screen, color, to_screen(sx + 0.5, sy + 0.5), 0.4 * tile, width=max(1, min(3, tile // 10)))
+
+            if SHOW_PATHS:
+                o = agent_offsets[aname]
+                for n1, n2 in zip(agent.positions, agent.positions[1:]):
+                    x1, y1 = graph.coords_from_id(n1)
+                    x2, y2 = graph.coords_from_id(n2)
+                    if visible(x1, y1) or visible(x2, y2):
+                        pygame.draw.line(screen,color,to_screen(x1+o, y1+o), to_screen(x2+o, y2+o), 2)
+
+        if SHOW_RESERVATIONS:
+            if agent_time not in reservation_cache:
+                reservation_cache[agent_time] = [graph.coords_from_id(r1) + graph.coords_from_id(r2) for r1,r2 in res[agent_time]]
+                if len(reservation_cache) > RESERVATION_CACHE_SIZE:
+                    reservation_cache.popitem(last=False)
+            reservation_cache.move_to_end(agent_time)
+            for x,y,x2,y2 in reservation_cache[agent_time]:
+                if not visible(x, y):
+                    continue
+                if (x,y)==(x2,y2):
+                    pygame.draw.rect(screen,(100,100,100),(*to_screen(x + 0.3, y + 0.3), tile * 0.4, tile * 0.4))
+                else:
+                    pygame.draw.polygon(screen,(100,100,100),[to_screen(x + 0.3, y + 0.3),to_screen(x + 0.7, y + 0.7), to_screen(x2 + 0.5, y2 + 0.5)])
+                    pygame.draw.polygon(screen,(100,100,100),[to_screen(x + 0.3, y + 0.7),to_screen(x + 0.7, y + 0.3), to_screen(x2 + 0.5, y2 + 0.5)])
+                
+            
+        keys = pygame.key.get_pressed()
+        lpress = bool(keys[pygame.K_a]) or bool(keys[pygame.K_LEFT])
+        rpress = bool(keys[pygame.K_d]) or bool(keys[pygame.K_RIGHT])
+        if not CONTINUOUS:
+            if lpress and not pressed["left"]:
+                agent_time = max(agent_time - 1, 0)
+            pressed["left"] = lpress
+            if rpress and not pressed["right"]:
+                agent_time += 1
+            pressed["right"] = rpress
+        else:
+            if lpress:
+                partial_time -= dt * SPEED
+            if rpress:
+                partial_time += dt * SPEED
+            
+            if partial_time < 0:
+                if agent_time == 0: partial_time = 0
+                else: partial_time += 1; agent_time -= 1
+            elif partial_time >= 1:
+                partial_time -= 1; agent_time += 1
+                
+            
+        mpress = bool(keys[pygame.K_m])
+        if mpress and not pressed["m"]:
+            if move_mode == COOP_MODE:
+                move_mode = INDEP_MODE
+                for a in agents.values(): a.positions = a.optimal_path
+            else:
+                move_mode = COOP_MODE
+                for a in agents.values(): a.positions = a.coop_path
+        pressed["m"] = mpress
+        ppress = bool(keys[pygame.K_p])
+        if ppress and not pressed["p"]:
+            SHOW_PATHS = not SHOW_PATHS
+        pressed["p"] = ppress
+        if keys[pygame.K_0]: agent_time = 0
+        if keys[pygame.K_9]: agent_time = max(len(a.positions) for a in agents.values())
+                    
+        # the text only changes with the time step and the move mode
+        if hud_key != (agent_time, move_mode):
+            time_render = font.render(f"t = {agent_time}", True, (255,255,255))
+            success_cnt = sum(1 for a in agents.values() if len(a.positions) > 1)
+            success_render = font.render(f"success rate = {success_cnt}/{len(agents)} ({success_cnt/len(agents):.1%})", True, (255,255,255))
+            hud_key = (agent_time, move_mode)
+        screen.blit(time_render, (5,5))
+        screen.blit(success_render, (80,5))
+        screen.blit(controls_render, (5,screen.get_height() - font.get_height() - 2))
+
+        # flip() the display to put your work on screen
+        pygame.display.flip()
+
+        # limits FPS to 60
+        # dt is delta time in seconds since last frame, used for framerate-
+        # independent physics.
+        dt = clock.tick(60) / 1000
+
     pygame.quit()
\ No newline at end of file